@@ -0,0 +1,159 @@
+"""Headless batch solver of random game 15 boards
+
+Generates N random solvable boards, solves them optimally on all cores and
+streams the results (solution length, nodes generated, time) to a JSONL or
+CSV file, chosen by the output file extension.
+
+Usage:
+    python batch.py N [--size 4] [--seed 15] [--workers K] [--chunk 8]
+                      [--output results.jsonl]
+
+4x4 pattern databases are loaded once into shared memory and every worker
+process reads them from there instead of getting its own copy.
+"""
+import argparse
+import csv
+import json
+import os
+import random as rnd
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import solver
+from game15 import Board, random_board
+
+FIELDS = ["index", "board", "length", "nodes", "time"]
+
+_shm = None
+_databases = None
+
+
+def pdb_offsets():
+    """Start of every pattern database in the shared memory block, and
+    the end of the last one"""
+    offsets = [0]
+    for group in solver.PDB_GROUPS:
+        offsets.append(offsets[-1] + solver.pdb_size(group))
+    return offsets
+
+
+def share_databases():
+    """Copy pattern databases into a new shared memory block, or None"""
+    databases = solver.load_databases()
+    if databases is None:
+        return None
+    offsets = pdb_offsets()
+    shm = shared_memory.SharedMemory(create=True, size=offsets[-1])
+    for k, db in enumerate(databases):
+        shm.buf[offsets[k]:offsets[k+1]] = db
+    return shm
+
+
+def init_worker(shm_name, count):
+    global _shm, _databases
+    if shm_name is None:
+        return
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    offsets = pdb_offsets()
+    _databases = [_shm.buf[offsets[k]:offsets[k+1]] for k in range(count)]
+
+
+def solve_chunk(size, chunk):
+    """Solve (index, cells) pairs, return a result record for each"""
+    records = []
+    for index, cells in chunk:
+        start = time.perf_counter()
+        moves, nodes = solver.solve(Board(size, size, cells), _databases)
+        records.append({
+            "index": index,
+            "board": " ".join(map(str, cells)),
+            "length": len(moves),
+            "nodes": nodes,
+            "time": round(time.perf_counter() - start, 6),
+        })
+    return records
+
+
+def generate_chunks(n, size, seed, chunk):
+    rng = rnd.Random(seed)
+    for lo in range(0, n, chunk):
+        yield [(i, list(random_board(size, size, rng).cells))
+               for i in range(lo, min(lo+chunk, n))]
+
+
+class ResultWriter:
+    """Streams result records to JSONL or CSV file"""
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.csv = None
+        if path.endswith(".csv"):
+            self.csv = csv.DictWriter(self.file, fieldnames=FIELDS)
+            self.csv.writeheader()
+
+    def write(self, records):
+        if self.csv is not None:
+            self.csv.writerows(records)
+        else:
+            self.file.writelines(json.dumps(r) + "\n" for r in records)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run(n, size=4, seed=15, workers=None, chunk=8, output="results.jsonl"):
+    """Solve n random boards, return the number of boards solved per second
+
+    At most two chunks per worker are in flight, so neither boards nor
+    results pile up in memory whatever n is.
+    """
+    workers = workers or os.cpu_count()
+    shm = share_databases() if size == 4 else None
+    shm_args = (None, 0) if shm is None else \
+        (shm.name, len(solver.PDB_GROUPS))
+    writer = ResultWriter(output)
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=shm_args) as executor:
+            chunks = generate_chunks(n, size, seed, chunk)
+            pending = set()
+            for boards in chunks:
+                pending.add(executor.submit(solve_chunk, size, boards))
+                if len(pending) >= 2*workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        writer.write(future.result())
+            for future in pending:
+                writer.write(future.result())
+    finally:
+        writer.close()
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve random game 15 boards")
+    parser.add_argument("n", type=int, help="number of boards")
+    parser.add_argument("--size", type=int, default=4, choices=[3, 4])
+    parser.add_argument("--seed", type=int, default=15)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes, all cores by default")
+    parser.add_argument("--chunk", type=int, default=8,
+                        help="boards per task and per write")
+    parser.add_argument("--output", default="results.jsonl",
+                        help=".jsonl or .csv file")
+    args = parser.parse_args()
+    if args.size == 4 and solver.load_databases() is None:
+        print("Warning: pattern databases are not built, "
+              "see `python solver.py --build-pdb`")
+    rate = run(args.n, args.size, args.seed, args.workers, args.chunk,
+               args.output)
+    print(f"{args.n} boards solved, {rate:.2f} boards/s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmarks for game 15 internals
+
+Run all of them via `python benchmark.py` or a single one via
+`python benchmark.py <name>`.
+"""
+import random as rnd
+import sys
+import time
+
+import game15
+
+
+def timed(func, *args, repeat=1):
+    """Best wall-clock time of `repeat` calls, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_disorder_rate(sizes=(4, 10, 20, 50, 100), batch=16, seed=15):
+    """Compare inversion counters across board sizes"""
+    rng = rnd.Random(seed)
+    counters = [
+        ("reference", game15.disorder_rate),
+        ("merge", game15.disorder_rate_merge),
+        ("fenwick", game15.disorder_rate_fenwick),
+    ]
+    print(f"{'board':>9} " + " ".join(f"{name:>11}" for name, _ in counters) +
+          f" {'batch/board':>12}")
+    for size in sizes:
+        values = list(range(1, size*size))
+        boards = []
+        for _ in range(batch):
+            rng.shuffle(values)
+            boards.append(list(values))
+        row, expected = [], None
+        for name, counter in counters:
+            if name == "reference" and size > 50:
+                row.append(f"{'skipped':>11}")
+                continue
+            elapsed, dr = timed(counter, boards[0])
+            assert expected is None or dr == expected, name
+            expected = dr
+            row.append(f"{elapsed*1000:9.2f}ms")
+        elapsed, drs = timed(game15.disorder_rate_batch, boards)
+        assert drs[0] == expected
+        row.append(f"{elapsed*1000/batch:10.2f}ms")
+        print(f"{size:>4}x{size:<4} " + " ".join(row))
+
+
+def solvable_corpus(size, count, seed):
+    """Fixed corpus of random solvable boards"""
+    rng = rnd.Random(seed)
+    return [game15.random_board(size, size, rng) for _ in range(count)]
+
+
+def bench_solver(corpus=((3, 100),), seed=15):
+    """Optimal solver over fixed corpora of random boards"""
+    import solver
+    databases = solver.load_databases()
+    if databases is None:
+        print("4x4 pattern databases are not built, "
+              "see `python solver.py --build-pdb`")
+    for size, count in corpus:
+        boards = solvable_corpus(size, count, seed)
+        times, lengths, nodes = [], [], []
+        for board in boards:
+            elapsed, (moves, expanded) = timed(solver.solve, board, databases)
+            times.append(elapsed)
+            lengths.append(len(moves))
+            nodes.append(expanded)
+        print(f"{size}x{size}: {count} boards, "
+              f"avg length {sum(lengths)/count:.1f}, "
+              f"avg nodes {sum(nodes)/count:.0f}, "
+              f"avg {sum(times)/count*1000:.1f}ms, "
+              f"median {sorted(times)[count//2]*1000:.1f}ms, "
+              f"max {max(times)*1000:.1f}ms")
+
+
+def bench_solver_4x4(count=50, seed=15):
+    """Optimal solver over random 4x4 boards: about a minute with the
+    pattern databases, not run by default"""
+    bench_solver(((4, count),), seed)
+
+
+def bench_replay(size=4, count=2_000_000, seed=15):
+    """Headless replay of a random walk move log"""
+    import solver
+    rng = rnd.Random(seed)
+    board = game15.random_board(size, size, rng)
+    log = game15.MoveLog(size, size, board.cells, seed)
+    nbrs = solver.neighbours(size, size)
+    cells, blank = list(board.cells), board.blank
+    for _ in range(count):
+        nb = rng.choice(nbrs[blank])
+        cells[blank], cells[nb] = cells[nb], 0
+        log.record(nb - blank)
+        blank = nb
+    elapsed, final = timed(log.replay, repeat=3)
+    assert list(final.cells) == cells
+    print(f"{count} moves in {len(log.moves)} bytes, replayed in "
+          f"{elapsed*1000:.0f}ms ({count/elapsed/1e6:.2f}M moves/s)")
+
+
+BENCHMARKS = {
+    "disorder_rate": bench_disorder_rate,
+    "solver": bench_solver,
+    "solver_4x4": bench_solver_4x4,
+    "replay": bench_replay,
+}
+# too slow for every run, only on request
+SLOW = {"solver_4x4"}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or [name for name in BENCHMARKS if name not in SLOW]
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
@@ -1,12 +1,33 @@
 """This is a module representing game 15 (15 puzzle) game"""
+import argparse
+import itertools
 import random as rnd
+import struct
+import threading
+import time
+from array import array
 
 import tkinter as tk
 from tkinter import messagebox
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from tkprobe import probed
+except ImportError:
+    def probed(func):
+        return func
+
 
 def disorder_rate(values):
-    """i.e. Inversion count calculation"""
+    """i.e. Inversion count calculation
+
+    Reference O(n^2) implementation, see disorder_rate_fast for boards
+    larger than 4x4.
+    """
     dr = 0
     for i in range(len(values)-1):
         for j in range(i+1,len(values)):
@@ -14,104 +35,555 @@ def disorder_rate(values):
                 dr += 1
     return dr
 
+def disorder_rate_merge(values):
+    """Inversion count via bottom-up merge sort, O(n log n)"""
+    src = list(values)
+    n = len(src)
+    dst = [0] * n
+    dr = 0
+    width = 1
+    while width < n:
+        for lo in range(0, n, 2*width):
+            mid = min(lo+width, n)
+            hi = min(lo+2*width, n)
+            i, j, k = lo, mid, lo
+            while i < mid and j < hi:
+                if src[j] < src[i]:
+                    # all the rest of the left run is greater than src[j]
+                    dr += mid - i
+                    dst[k] = src[j]
+                    j += 1
+                else:
+                    dst[k] = src[i]
+                    i += 1
+                k += 1
+            dst[k:hi] = src[i:mid] if i < mid else src[j:hi]
+        src, dst = dst, src
+        width *= 2
+    return dr
+
+def disorder_rate_fenwick(values):
+    """Inversion count via Fenwick (binary indexed) tree, O(n log n)
+
+    Values are expected to be non-negative integers, as tile numbers are.
+    """
+    size = max(values, default=0) + 1
+    tree = [0] * (size+1)
+    dr = 0
+    for seen, v in enumerate(values):
+        # count of already seen values that are <= v
+        not_greater = 0
+        i = v + 1
+        while i > 0:
+            not_greater += tree[i]
+            i -= i & -i
+        dr += seen - not_greater
+        i = v + 1
+        while i <= size:
+            tree[i] += 1
+            i += i & -i
+    return dr
+
+disorder_rate_fast = disorder_rate_fenwick
+
+def disorder_parity(perm):
+    """Parity of the inversion count of a permutation of 0..n-1 in O(n)
+
+    Equals the parity of len(perm) - <count of the permutation cycles>.
+    """
+    seen = bytearray(len(perm))
+    cycles = 0
+    for i in range(len(perm)):
+        if not seen[i]:
+            cycles += 1
+            while not seen[i]:
+                seen[i] = 1
+                i = perm[i]
+    return (len(perm) - cycles) % 2
+
+# above this many tiles O(n^2) pairwise comparison loses to the Fenwick tree
+# even vectorized over the batch
+BATCH_PAIRWISE_LIMIT = 1024
+
+def disorder_rate_batch(boards):
+    """Inversion counts for a batch of equally sized boards
+
+    NumPy is used to compare every board at once if it is installed and
+    the boards have at most BATCH_PAIRWISE_LIMIT tiles, otherwise boards
+    are handled one by one with disorder_rate_fast.
+    """
+    if np is None:
+        return [disorder_rate_fast(values) for values in boards]
+    arr = np.asarray(boards)
+    if arr.ndim != 2 or arr.shape[0] == 0 or \
+            arr.shape[1] > BATCH_PAIRWISE_LIMIT:
+        return [disorder_rate_fast(values) for values in boards]
+    dr = np.zeros(arr.shape[0], dtype=np.int64)
+    for i in range(arr.shape[1]-1):
+        dr += (arr[:, i:i+1] > arr[:, i+1:]).sum(axis=1)
+    return dr.tolist()
+
+class Board:
+    """Headless game 15 board model, no Tk involved
+
+    `cells` stores tile numbers row by row, 0 stands for the blank plate.
+    `pos` is the inverse permutation: cell index of every tile number.
+    `misplaced` counts tiles which are not at their final cell, so the win
+    check is O(1) and every move updates it in O(1).
+    """
+    __slots__ = ("w", "h", "cells", "pos", "blank", "misplaced")
+
+    def __init__(self, w, h, cells=None):
+        self.w = w
+        self.h = h
+        if cells is None:
+            cells = list(range(1, w*h)) + [0]
+        self.cells = array("I", cells)
+        self.pos = array("I", bytes(self.cells.itemsize * w*h))
+        self.misplaced = 0
+        for i, n in enumerate(self.cells):
+            self.pos[n] = i
+            self.misplaced += n != 0 and n != i+1
+        self.blank = self.pos[0]
+
+    @property
+    def blank_coord(self):
+        return divmod(self.blank, self.w)
+
+    def place(self, blank_coord, tiles):
+        """Put the blank at blank_coord and fill the rest row by row"""
+        self.blank = blank_coord[0]*self.w + blank_coord[1]
+        it = iter(tiles)
+        self.misplaced = 0
+        for i in range(self.w*self.h):
+            n = 0 if i == self.blank else next(it)
+            self.cells[i] = n
+            self.pos[n] = i
+            self.misplaced += n != 0 and n != i+1
+
+    def shuffle(self, rng=rnd, blank_coord=None):
+        """Uniformly random solveable arrangement in O(n)
+
+        Tiles are shuffled once; if the result is unsolveable, swapping two
+        tiles flips the disorder rate parity. The swap maps unsolveable
+        arrangements one-to-one onto solveable ones, so uniformity is kept.
+        """
+        if blank_coord is None:
+            blank_coord = (rng.randint(0,self.h-1), rng.randint(0,self.w-1))
+        tiles = list(range(1, self.w*self.h))
+        rng.shuffle(tiles)
+        if len(tiles) > 1 and \
+                not self._solveable(tiles, blank_coord[0]):
+            tiles[0], tiles[1] = tiles[1], tiles[0]
+        self.place(blank_coord, tiles)
+
+    def tiles(self):
+        """Tile numbers in row-major order, without the blank"""
+        return [n for n in self.cells if n != 0]
+
+    def is_solveable(self):
+        """Method to check solveability of the game, i.e. inversion count
+
+        Knowingly unsolveable number grid is identified by the following rule:
+        (assume ir = <index_of_a_row_where_the_gap_is_positioned>)
+        (disorder_rate(grid_numbers) + h - ir) % 2 == 1 for even widths,
+        disorder_rate(grid_numbers) % 2 == 1 for odd ones (every vertical
+        move then keeps the parity of disorder rate)
+        """
+        return self._solveable(self.tiles(), self.blank // self.w)
+
+    def _solveable(self, tiles, blank_row):
+        # only the parity of disorder rate matters, see disorder_parity
+        dr = disorder_parity([n-1 for n in tiles])
+        if self.w % 2 == 1:
+            return dr % 2 == 0
+        ir = blank_row + 1 # indexing of the row starts with 1
+        return (dr + self.h - ir) % 2 == 0
+
+    def is_solved(self):
+        return self.misplaced == 0
+
+    def is_movable(self, n):
+        """Whether tile n is a neighbour of the blank plate"""
+        row, col = divmod(self.pos[n], self.w)
+        blank_row, blank_col = divmod(self.blank, self.w)
+        return abs(blank_row-row) + abs(blank_col-col) == 1
+
+    def move(self, n):
+        """Slide tile n into the blank, return False if it is not adjacent"""
+        if n == 0 or not self.is_movable(n):
+            return False
+        i, blank = self.pos[n], self.blank
+        # tile n leaves cell i for the blank cell, only its own goal matters
+        self.misplaced += (i == n-1) - (blank == n-1)
+        self.cells[blank] = n
+        self.cells[i] = 0
+        self.pos[n] = blank
+        self.pos[0] = i
+        self.blank = i
+        return True
+
+
+def random_board(w, h, rng=rnd):
+    """Random solveable board with the blank plate anywhere"""
+    board = Board(w, h)
+    board.shuffle(rng)
+    return board
+
+
+class MoveLog:
+    """Compact record of a game: initial board and moves, 2 bits per move
+
+    A move is stored as the direction the blank plate goes to (see
+    DIRECTIONS), four moves per byte, lowest bits first.
+    """
+    DIRECTIONS = ("up", "down", "left", "right")
+    HEADER = struct.Struct("<4sBBqQ")
+    MAGIC = b"G15L"
+
+    def __init__(self, w, h, cells, seed=None):
+        self.w = w
+        self.h = h
+        self.cells = array("H", cells)
+        self.seed = seed
+        self.moves = bytearray()
+        self.count = 0
+        self.codes = {-w: 0, w: 1, -1: 2, 1: 3}
+
+    def record(self, delta):
+        """Append a move of the blank by delta cells"""
+        code = self.codes[delta]
+        shift = 2 * (self.count & 3)
+        if shift == 0:
+            self.moves.append(code)
+        else:
+            self.moves[-1] |= code << shift
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def directions(self):
+        """Codes of the recorded moves, see DIRECTIONS"""
+        for i in range(self.count):
+            yield (self.moves[i >> 2] >> (2 * (i & 3))) & 3
+
+    def replay(self):
+        """Final board after all the recorded moves, no Tk involved
+
+        Moves are trusted to be valid, as they were recorded from a game.
+        """
+        w = self.w
+        deltas = (-w, w, -1, 1)
+        table = [tuple(deltas[(byte >> shift) & 3] for shift in (0, 2, 4, 6))
+                 for byte in range(256)]
+        cells = list(self.cells)
+        blank = cells.index(0)
+        full, rest = divmod(self.count, 4)
+        moves = self.moves
+        for k in range(full):
+            for d in table[moves[k]]:
+                cells[blank] = cells[blank+d]
+                blank += d
+        if rest:
+            for d in table[moves[full]][:rest]:
+                cells[blank] = cells[blank+d]
+                blank += d
+        cells[blank] = 0
+        return Board(self.w, self.h, cells)
+
+    def dump(self, f):
+        seed = -1 if self.seed is None else self.seed
+        f.write(self.HEADER.pack(self.MAGIC, self.w, self.h, seed, self.count))
+        f.write(self.cells.tobytes())
+        f.write(self.moves)
+
+    @classmethod
+    def load(cls, f):
+        """Read the next log written by dump, None at the end of file"""
+        header = f.read(cls.HEADER.size)
+        if not header:
+            return None
+        magic, w, h, seed, count = cls.HEADER.unpack(header)
+        if magic != cls.MAGIC:
+            raise ValueError("not a game 15 move log")
+        cells = array("H")
+        cells.frombytes(f.read(cells.itemsize * w*h))
+        log = cls(w, h, cells, None if seed == -1 else seed)
+        log.moves = bytearray(f.read((count+3) // 4))
+        log.count = count
+        return log
+
+    @classmethod
+    def load_all(cls, path):
+        with open(path, "rb") as f:
+            while (log := cls.load(f)) is not None:
+                yield log
+
+
 class GameGrid:
-    def __init__(self, w, h):
+    """Tk side of the game: buttons rendered from the Board model"""
+    def __init__(self, w, h, seed=None, log_path=None):
         self.w = w
         self.h = h
-        self.numbers = list(range(w*h))
-        self.buttons = []
-        self.blank_coord = (rnd.randint(0,h-1), rnd.randint(0,w-1))
+        self.seed = seed
+        self.rng = rnd.Random(seed)
+        self.board = Board(w, h)
+        self.buttons = {}
+        self.log = MoveLog(w, h, self.board.cells, seed)
+        self.log_path = log_path
+        # a solver thread is running, Hint and Solve are ignored meanwhile
+        self.solving = False
         #self.blank_coord = (3, 2)
 
-    def shuffle_buttons(self):
-        rnd.shuffle(self.buttons)
-        reconstruction_required = False
-        while not self.is_solveable():
-            print("Reconstructing game grid to avoid unwinnable case...")
-            reconstruction_required = True
-            rnd.shuffle(self.buttons)
-        if reconstruction_required:
-            print("Done.")
+    @property
+    def blank_coord(self):
+        return self.board.blank_coord
+
+    def shuffle_buttons(self, blank_coord=None):
+        self.board.shuffle(self.rng, blank_coord)
+        self.log = MoveLog(self.w, self.h, self.board.cells, self.seed)
+
+    def save_log(self):
+        """Append the log of the current game to log_path if it has moves"""
+        if self.log_path is not None and len(self.log) > 0:
+            with open(self.log_path, "ab") as f:
+                self.log.dump(f)
 
     def initialize_game_buttons(self, window):
-        self.buttons = []
-        for i in range(self.h):
-            for j in range(self.w):
-                n = self.numbers[i*self.w+j]
-                if n != 0:
-                    button = tk.Button(master=window,
-                                    text=f"{n}".rjust(2," "),
-                                    font="Arial 20")
-                    def button_handler(game_grid=self, button=button):
-                        playstep(game_grid, button)
-                    button.configure(command=button_handler)
-                    self.buttons.append(button)
+        self.buttons = {}
+        for n in range(1, self.w*self.h):
+            button = tk.Button(master=window,
+                            text=f"{n}".rjust(2," "),
+                            font="Arial 20")
+            def button_handler(game_grid=self, n=n):
+                playstep(game_grid, n)
+            button.configure(command=button_handler)
+            self.buttons[n] = button
         self.shuffle_buttons()
 
     def initialize_game_grid(self):
-        bi = 0
-        for i in range(self.h):
-            for j in range(self.w):
-                if self.blank_coord != (i,j):
-                    self.buttons[bi].grid(row=i+1, column=j, sticky="WESN")
-                    bi += 1
+        for n, button in self.buttons.items():
+            self.place_button(n)
+
+    def place_button(self, n):
+        i, j = divmod(self.board.pos[n], self.w)
+        self.buttons[n].grid(row=i+1, column=j, sticky="WESN")
 
     def is_solveable(self):
-        """Method to check solveability of the game, i.e. inversion count
-            
-        Knowingly unsolveable number grid is identified by the following rule:
-        (assume ir = <index_of_a_row_where_the_gap_is_positioned>)
-        (disorder_rate(grid_numbers) + ir) % 2 == 1
-        """
-        button_numbers = list(map(lambda b: int(b.cget("text")),
-                            self.buttons))
-        dr = disorder_rate(button_numbers);
-        ir = self.blank_coord[0] + 1; # indexing of the row starts with 1
-        return (dr + ir) % 2 == 0
-                    
-
-def playstep(game_grid, button):
-    info = button.grid_info()
-    row,col = info["row"],info["column"]
-    row -= 1 # shift according to window grid
-    blank_row, blank_col = game_grid.blank_coord
-    if (abs(blank_row-row) == 1 and abs(blank_col-col) == 0) or \
-        (abs(blank_row-row) == 0 and abs(blank_col-col) == 1):
-        button.grid(row=blank_row+1, column=blank_col, sticky="WESN")
-        game_grid.blank_coord = (row,col)
-    
-
-def quit_game(game_state):
-    game_state["over"] = True
-
-def restart_game(gg, game_state):
-    gg.blank_coord = (rnd.randint(0,gg.h-1), rnd.randint(0,gg.w-1))
+        return self.board.is_solveable()
+
+
+class CanvasGrid(GameGrid):
+    """Tiles drawn as items of a single canvas instead of gridded buttons
+
+    A move slides the tile items with Canvas.move, driven by `after` once
+    per frame, so no geometry re-layout happens. All the tiles which got
+    moves within the same frame are advanced by one callback. Tile
+    positions are tracked on the Python side, the canvas is never queried.
+    """
+    def __init__(self, w, h, seed=None, log_path=None, tile_size=80,
+                 frame_ms=16, move_ms=96):
+        super().__init__(w, h, seed, log_path)
+        self.tile_size = tile_size
+        self.frame_ms = frame_ms
+        self.step = max(1, tile_size * frame_ms // move_ms)
+        self.canvas = None
+        self.items = {}
+        self.xy = {}
+        self.moving = {}
+        self.frame_scheduled = False
+
+    def initialize_game_buttons(self, window):
+        size = self.tile_size
+        self.canvas = tk.Canvas(window, width=self.w*size,
+                                height=self.h*size, bg="gray80",
+                                highlightthickness=0)
+        self.canvas.grid(row=1, column=0, columnspan=self.w)
+        self.items = {}
+        for n in range(1, self.w*self.h):
+            rect = self.canvas.create_rectangle(1, 1, size-1, size-1,
+                                                fill="gray92",
+                                                outline="gray40")
+            text = self.canvas.create_text(size//2, size//2, text=f"{n}",
+                                           font="Arial 20")
+            self.items[n] = (rect, text)
+            self.xy[n] = (0, 0)
+        self.canvas.bind("<Button-1>", self.click)
+        self.shuffle_buttons()
+
+    def click(self, event):
+        col, row = event.x // self.tile_size, event.y // self.tile_size
+        if 0 <= row < self.h and 0 <= col < self.w:
+            n = self.board.cells[row*self.w + col]
+            if n != 0:
+                playstep(self, n)
+
+    def cell_xy(self, n):
+        i, j = divmod(self.board.pos[n], self.w)
+        return j*self.tile_size, i*self.tile_size
+
+    def shift(self, n, dx, dy):
+        for item in self.items[n]:
+            self.canvas.move(item, dx, dy)
+        x, y = self.xy[n]
+        self.xy[n] = (x+dx, y+dy)
+
+    def initialize_game_grid(self):
+        self.moving = {}
+        for n in self.items:
+            (x, y), (tx, ty) = self.xy[n], self.cell_xy(n)
+            self.shift(n, tx-x, ty-y)
+
+    def place_button(self, n):
+        self.moving[n] = self.cell_xy(n)
+        if not self.frame_scheduled:
+            self.frame_scheduled = True
+            self.canvas.after(self.frame_ms, self.frame)
+
+    def frame(self):
+        self.frame_scheduled = False
+        step = self.step
+        for n, (tx, ty) in list(self.moving.items()):
+            x, y = self.xy[n]
+            dx = max(-step, min(step, tx-x))
+            dy = max(-step, min(step, ty-y))
+            self.shift(n, dx, dy)
+            if (x+dx, y+dy) == (tx, ty):
+                del self.moving[n]
+        if self.moving:
+            self.frame_scheduled = True
+            self.canvas.after(self.frame_ms, self.frame)
+
+
+@probed
+def playstep(game_grid, n):
+    board = game_grid.board
+    if board.move(n):
+        game_grid.log.record(board.blank - board.pos[n])
+        game_grid.place_button(n)
+        if check_win_condition(game_grid):
+            messagebox.showinfo(":)", "Congraz! You won!")
+            restart_game(game_grid)
+
+
+def quit_game(window):
+    window.quit()
+
+def restart_game(gg):
+    gg.save_log()
     gg.shuffle_buttons()
-    game_state["restart"] = True
+    gg.initialize_game_grid()
 
 def check_win_condition(gg):
-    for b in gg.buttons:
-        n = int(b.cget('text'))
-    vis_numbers_order = list(map(lambda b:
-                                int(b.cget('text'))-1, gg.buttons))
-    pos_order = list(map(lambda b: (b.grid_info()['row']-1)*gg.w +
-                                  b.grid_info()['column'], gg.buttons))
-    #print("vis_numbers ", vis_numbers)
-    #print("pos_order ", pos_order)
-    return vis_numbers_order == pos_order
-
-
-def main():
+    return gg.board.is_solved()
+
+def solve_in_background(window, gg, callback):
+    """Run the optimal solver in a thread, pass its moves to callback
+
+    The result is dropped if the board is changed while solving. Only one
+    solver runs at a time, requests made while it works are ignored.
+    """
+    import solver
+    if gg.solving or (gg.w, gg.h) == (4, 4) and \
+            solver.load_databases() is None:
+        return
+    gg.solving = True
+    board = Board(gg.w, gg.h, gg.board.cells)
+    result = []
+    def work():
+        try:
+            result.append(solver.solve(board, solver.load_databases())[0])
+        except ValueError:
+            pass
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+    def poll():
+        if worker.is_alive():
+            window.after(50, poll)
+            return
+        gg.solving = False
+        if result and board.cells == gg.board.cells:
+            callback(result[0])
+    poll()
+
+def hint(window, gg):
+    def play_first(moves):
+        if moves:
+            playstep(gg, moves[0])
+    solve_in_background(window, gg, play_first)
+
+def solve_game(window, gg, delay=200):
+    """Play the optimal solution, one move per delay
+
+    Playback stops as soon as the board is not the one the previous move
+    left: the user moved a tile or started a new game.
+    """
+    def play(moves, expected=None):
+        if not moves or expected is not None and gg.board.cells != expected:
+            return
+        playstep(gg, moves[0])
+        window.after(delay, play, moves[1:], array("I", gg.board.cells))
+    solve_in_background(window, gg, play)
+
+def replay_game(window, gg, logs, delay=200):
+    """Animate recorded games one after another"""
+    log = next(logs, None)
+    if log is None:
+        return
+    gg.board = Board(log.w, log.h, log.cells)
+    # moves are recorded again: they must be paired with this board
+    gg.log = MoveLog(log.w, log.h, log.cells, log.seed)
+    gg.initialize_game_grid()
+    deltas = (-log.w, log.w, -1, 1)
+    directions = log.directions()
+    def play():
+        d = next(directions, None)
+        if d is None:
+            window.after(5*delay, replay_game, window, gg, logs, delay)
+            return
+        board = gg.board
+        playstep(gg, board.cells[board.blank + deltas[d]])
+        window.after(delay, play)
+    play()
+
+def replay_headless(path):
+    """Replay all the logs of the file without Tk, print the outcome"""
+    games = moves = solved = 0
+    start = time.perf_counter()
+    for log in MoveLog.load_all(path):
+        games += 1
+        moves += len(log)
+        solved += log.replay().is_solved()
+    elapsed = time.perf_counter() - start
+    print(f"{games} games, {solved} solved, {moves} moves replayed "
+          f"in {elapsed:.3f}s ({moves/max(elapsed, 1e-9):.0f} moves/s)")
+
+
+def main(seed=None, canvas=False, log_path=None, replay_path=None):
     window = tk.Tk()
     window.title("Game 15")
     window.geometry("+500+300")
 
     w,h = 4,4
-    gg = GameGrid(w,h)
-    game_state = {
-        "over": False,
-        "restart": True 
-    }
+    logs = None
+    if replay_path is not None:
+        logs = MoveLog.load_all(replay_path)
+        first = next(logs, None)
+        if first is not None:
+            w,h = first.w, first.h
+            logs = itertools.chain([first], logs)
+    gg = CanvasGrid(w,h,seed,log_path) if canvas else \
+        GameGrid(w,h,seed,log_path)
+    # 4x4 boards are solved in reasonable time only with the pattern
+    # databases: they are mapped once here, Hint and Solve are disabled
+    # if they are not built
+    import solver
+    solver_state = tk.NORMAL
+    if (w,h) == (4,4) and solver.load_databases() is None:
+        print("Warning: pattern databases are not built, Hint and Solve are "
+              "disabled, see `python solver.py --build-pdb`")
+        solver_state = tk.DISABLED
     for i in range(1,h+1):
         window.rowconfigure(i, weight=1)
     for j in range(w):
@@ -119,24 +591,47 @@ def main():
 
     button = tk.Button(master=window, text=f"New",
                        font="Arial 18",
-                       command=lambda: restart_game(gg, game_state))
-    button.grid(row=0, column=0, columnspan=2)
+                       command=lambda: restart_game(gg))
+    button.grid(row=0, column=0)
+
+    button = tk.Button(master=window, text=f"Hint",
+                       font="Arial 18", state=solver_state,
+                       command=lambda: hint(window, gg))
+    button.grid(row=0, column=1)
+
+    button = tk.Button(master=window, text=f"Solve",
+                       font="Arial 18", state=solver_state,
+                       command=lambda: solve_game(window, gg))
+    button.grid(row=0, column=2)
 
     button = tk.Button(master=window, text=f"Exit",
                        font="Arial 18",
-                       command=lambda: quit_game(game_state))
-    button.grid(row=0, column=2, columnspan=2)
+                       command=lambda: quit_game(window))
+    button.grid(row=0, column=3)
 
     gg.initialize_game_buttons(window)
-    while not game_state["over"]:
-        if game_state["restart"]:
-            gg.initialize_game_grid()
-            game_state["restart"] = False 
-        window.update()
-        if check_win_condition(gg):
-            messagebox.showinfo(":)", "Congraz! You won!")
-            restart_game(gg, game_state)
+    gg.initialize_game_grid()
+    if logs is not None:
+        replay_game(window, gg, logs)
+    # nothing is polled: tiles are checked for a win only after a move
+    window.mainloop()
+    gg.save_log()
     window.destroy()
 
 if __name__=="__main__":
-   main() 
+    parser = argparse.ArgumentParser(description="Game 15")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for reproducible boards")
+    parser.add_argument("--canvas", action="store_true",
+                        help="draw tiles on a canvas with animated moves")
+    parser.add_argument("--log", default=None, metavar="FILE",
+                        help="append move logs of the played games to FILE")
+    parser.add_argument("--replay", default=None, metavar="FILE",
+                        help="replay move logs from FILE")
+    parser.add_argument("--headless", action="store_true",
+                        help="replay without a window, as fast as possible")
+    args = parser.parse_args()
+    if args.replay is not None and args.headless:
+        replay_headless(args.replay)
+    else:
+        main(args.seed, args.canvas, args.log, args.replay) 
@@ -0,0 +1,423 @@
+"""Optimal solver for game 15 boards (3x3 and 4x4)
+
+IDA* search guided by Manhattan distance plus linear conflict. 4x4 boards
+also use additive 6-6-3 pattern databases if they are built, see
+`python solver.py --build-pdb`. A database is a flat byte array indexed by
+the cells of its tiles (4 bits each) and is memory-mapped on load.
+The databases are looked up for the board mirrored along its main
+diagonal as well, which has the same distance to the goal.
+
+Usage:
+    python solver.py [--build-pdb] [--size N] [tile ...]
+where tiles are listed row by row, 0 stands for the blank plate.
+"""
+import mmap
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from game15 import Board
+
+PDB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdb")
+# tiles of the 4x4 board split into disjoint groups, one database each
+PDB_GROUPS = ((1, 5, 6, 9, 10, 13), (7, 8, 11, 12, 14, 15), (2, 3, 4))
+PDB_CELLS = 16
+UNSEEN = 0xFF
+
+FOUND = -1
+UNBOUNDED = 1 << 30
+
+
+def neighbours(w, h):
+    """Adjacent cells of every cell of a w x h board"""
+    result = []
+    for i in range(w*h):
+        row, col = divmod(i, w)
+        cells = []
+        if row > 0: cells.append(i-w)
+        if row < h-1: cells.append(i+w)
+        if col > 0: cells.append(i-1)
+        if col < w-1: cells.append(i+1)
+        result.append(tuple(cells))
+    return result
+
+
+def pdb_path(group):
+    return os.path.join(PDB_DIR, "pdb4x4_" + "_".join(map(str, group)) + ".bin")
+
+
+def pdb_size(group):
+    return 1 << (4*len(group))
+
+
+def pdb_index(cells_of_tiles):
+    idx = 0
+    for cell in cells_of_tiles:
+        idx = (idx << 4) | cell
+    return idx
+
+
+def build_pdb(group):
+    """Breadth-first search backwards from the goal over (tiles, blank)
+
+    Only moves of the group tiles are counted, blank walks over the other
+    cells for free, so databases of disjoint groups may be summed up.
+    """
+    nbrs = neighbours(4, 4)
+    size = len(group)
+    pdb = bytearray([UNSEEN]) * pdb_size(group)
+    seen = bytearray(pdb_size(group) * PDB_CELLS)
+    start = pdb_index(t-1 for t in group)
+    blank = PDB_CELLS - 1
+    seen[(start << 4) | blank] = 1
+    layer = [(start << 4) | blank]
+    depth = 0
+    while layer:
+        next_layer = []
+        k = 0
+        while k < len(layer):
+            state = layer[k]
+            k += 1
+            idx, blank = state >> 4, state & 15
+            if pdb[idx] == UNSEEN:
+                pdb[idx] = depth
+            occupied = {}
+            for slot in range(size):
+                occupied[(idx >> (4*(size-1-slot))) & 15] = slot
+            for cell in nbrs[blank]:
+                slot = occupied.get(cell)
+                if slot is None:
+                    # free move of the blank, same depth
+                    new_state = (idx << 4) | cell
+                    if not seen[new_state]:
+                        seen[new_state] = 1
+                        layer.append(new_state)
+                else:
+                    shift = 4*(size-1-slot)
+                    new_idx = idx ^ ((cell ^ blank) << shift)
+                    new_state = (new_idx << 4) | cell
+                    if not seen[new_state]:
+                        seen[new_state] = 1
+                        next_layer.append(new_state)
+        layer = next_layer
+        depth += 1
+    return pdb
+
+
+def build_pdb_numpy(group):
+    """Same search as build_pdb, a whole layer of states at a time
+
+    Distances of all (tiles, blank) states are kept in one byte array,
+    the database is its minimum over the blank cells.
+    """
+    size = len(group)
+    shifts = [4*(size-1-slot) for slot in range(size)]
+    # cell next to every cell in each direction, -1 off the board
+    steps = [np.array([i+d if 0 <= i+d < PDB_CELLS and
+                       (d in (-4, 4) or (i+d) // 4 == i // 4) else -1
+                       for i in range(PDB_CELLS)], dtype=np.int32)
+             for d in (-4, 4, -1, 1)]
+    dist = np.full(pdb_size(group) * PDB_CELLS, UNSEEN, dtype=np.uint8)
+    start = (pdb_index(t-1 for t in group) << 4) | (PDB_CELLS-1)
+    dist[start] = 0
+    layer = np.array([start], dtype=np.int32)
+    depth = 0
+    while layer.size:
+        moved = []
+        new = layer
+        while new.size:
+            # free moves of the blank, same depth
+            idx, blank = new >> 4, new & 15
+            tiles = [(idx >> shift) & 15 for shift in shifts]
+            free = []
+            for step in steps:
+                cell = step[blank]
+                empty = cell >= 0
+                for shift, tile in zip(shifts, tiles):
+                    hit = tile == cell
+                    empty &= ~hit
+                    moved.append((idx[hit] ^ ((cell[hit] ^ blank[hit])
+                                              << shift)) << 4 | cell[hit])
+                free.append(idx[empty] << 4 | cell[empty])
+            new = np.concatenate(free)
+            new = np.unique(new[dist[new] == UNSEEN])
+            dist[new] = depth
+        # all states of this depth are marked, moves of the group tiles
+        # lead to the next one
+        layer = np.concatenate(moved)
+        layer = np.unique(layer[dist[layer] == UNSEEN])
+        depth += 1
+        dist[layer] = depth
+    return dist.reshape(-1, PDB_CELLS).min(axis=1).tobytes()
+
+
+def build_databases(verbose=True):
+    """Build all the databases, with NumPy if it is installed
+
+    Pure Python takes tens of minutes for the six tile groups.
+    """
+    build = build_pdb if np is None else build_pdb_numpy
+    os.makedirs(PDB_DIR, exist_ok=True)
+    for group in PDB_GROUPS:
+        start = time.perf_counter()
+        pdb = build(group)
+        with open(pdb_path(group), "wb") as f:
+            f.write(pdb)
+        if verbose:
+            print(f"{pdb_path(group)}: max depth {max(set(pdb) - {UNSEEN})}, "
+                  f"{time.perf_counter()-start:.1f}s")
+
+
+_databases = None
+
+
+def load_databases():
+    """Memory-mapped 4x4 pattern databases or None if not built yet
+
+    The files are mapped once per process, later calls return the same
+    maps.
+    """
+    global _databases
+    if _databases is not None:
+        return _databases
+    databases = []
+    for group in PDB_GROUPS:
+        try:
+            with open(pdb_path(group), "rb") as f:
+                db = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            db = None
+        if db is None or len(db) != pdb_size(group):
+            # missing or left from another partition
+            if db is not None:
+                db.close()
+            for db in databases:
+                db.close()
+            return None
+        databases.append(db)
+    _databases = databases
+    return databases
+
+
+def _lis_length(seq):
+    tails = []
+    for v in seq:
+        i = 0
+        while i < len(tails) and tails[i] < v:
+            i += 1
+        if i == len(tails):
+            tails.append(v)
+        else:
+            tails[i] = v
+    return len(tails)
+
+
+def conflict_table(w):
+    """Linear conflict penalty of every line key of a w wide board
+
+    A line key has a base w+1 digit per cell of the line, the first cell
+    is the lowest digit: 1 + goal position along the line for a tile
+    whose goal is in this line, 0 for any other tile and the blank.
+    Tiles not in the longest increasing subsequence of goal positions
+    have to leave the line, which costs two extra moves each.
+    """
+    base = w + 1
+    table = []
+    for key in range(base**w):
+        seq = []
+        while key:
+            key, digit = divmod(key, base)
+            if digit:
+                seq.append(digit)
+        table.append(2 * (len(seq) - _lis_length(seq)))
+    return table
+
+
+def solve(board, databases=None):
+    """Optimal solution of the board
+
+    Returns (moves, nodes): tile numbers to slide into the blank one after
+    another and the number of generated search nodes. `databases` are used
+    for 4x4 boards only, see load_databases.
+    """
+    w, h = board.w, board.h
+    if (w, h) not in ((3, 3), (4, 4)):
+        raise ValueError(f"{w}x{h} boards are not supported")
+    if not board.is_solveable():
+        raise ValueError("board is not solveable")
+    if (w, h) != (4, 4):
+        databases = None
+    n, base = w*h, w+1
+
+    cells = list(board.cells)
+    manhattan = [[0]*n] + [
+        [abs(i//w - (t-1)//w) + abs(i % w - (t-1) % w) for i in range(n)]
+        for t in range(1, n)]
+    # line keys, rows first, then columns, see conflict_table; weight of
+    # tile t in cell i is its digit in the row and in the column of i
+    conflict = conflict_table(w)
+    row_weight, col_weight = [[0]*n], [[0]*n]
+    for t in range(1, n):
+        goal_row, goal_col = divmod(t-1, w)
+        row_weight.append([(goal_col+1) * base**(i % w)
+                           if i // w == goal_row else 0 for i in range(n)])
+        col_weight.append([(goal_row+1) * base**(i // w)
+                           if i % w == goal_col else 0 for i in range(n)])
+    keys = [0] * (h+w)
+    for i, t in enumerate(cells):
+        keys[i // w] += row_weight[t][i]
+        keys[h + i % w] += col_weight[t][i]
+    md = sum(manhattan[t][i] for i, t in enumerate(cells))
+    lc = sum(conflict[k] for k in keys)
+
+    if databases is not None:
+        mirror = [(i % w)*w + i//w for i in range(n)]
+        group_of = [(None, 0)] * n
+        for g, group in enumerate(PDB_GROUPS):
+            for slot, t in enumerate(group):
+                group_of[t] = (g, 4*(len(group)-1-slot))
+        # tile t of the board is tile mirror_of[t] of the mirrored board
+        mirror_of = [0] + [mirror[t-1]+1 for t in range(1, n)]
+        idx = [pdb_index(cells.index(t) for t in group) for group in PDB_GROUPS]
+        mirror_idx = [pdb_index(mirror[cells.index(mirror_of[t])]
+                                for t in group)
+                      for group in PDB_GROUPS]
+        pdb_sum = sum(db[i] for db, i in zip(databases, idx))
+        mirror_sum = sum(db[i] for db, i in zip(databases, mirror_idx))
+    else:
+        pdb_sum = mirror_sum = 0
+
+    # every move of the blank from its cell, with everything a move of
+    # tile t along it changes, precomputed: moves[blank] lists (src, m),
+    # effects[t][m] is (Manhattan distance change, the two crossed line
+    # keys and their changes, the key and change of the line the tile
+    # moves along, group and index change in both database lookups)
+    moves = [[] for _ in range(n)]
+    effects = [[] for _ in range(n)]
+    for blank, nbrs in enumerate(neighbours(w, h)):
+        for src in nbrs:
+            m = len(effects[0])
+            moves[blank].append((src, m))
+            if src // w != blank // w:
+                a, b, c = src // w, blank // w, h + src % w
+                cross, along = row_weight, col_weight
+            else:
+                a, b, c = h + src % w, h + blank % w, src // w
+                cross, along = col_weight, row_weight
+            for t in range(n):
+                grp = x = mgrp = mx = None
+                if databases is not None and t != 0:
+                    grp, shift = group_of[t]
+                    x = (src ^ blank) << shift
+                    mgrp, mshift = group_of[mirror_of[t]]
+                    mx = (mirror[src] ^ mirror[blank]) << mshift
+                effects[t].append((
+                    manhattan[t][blank] - manhattan[t][src],
+                    a, -cross[t][src], b, cross[t][blank],
+                    c, along[t][blank] - along[t][src],
+                    grp, x, mgrp, mx))
+
+    path = []
+    nodes = 0
+
+    def search(blank, g, bound, prev, md, lc, pdb_sum, mirror_sum):
+        """FOUND or the smallest f above bound below this node
+
+        Children are checked against the bound before descending into
+        them, the state is changed only for the ones descended into.
+        """
+        nonlocal nodes
+        best = UNBOUNDED
+        g += 1
+        for src, m in moves[blank]:
+            if src == prev:
+                continue
+            nodes += 1
+            t = cells[src]
+            dmd, a, da, b, db, c, dc, grp, x, mgrp, mx = effects[t][m]
+            new_md = md + dmd
+            ka, kb = keys[a], keys[b]
+            new_lc = lc - conflict[ka] - conflict[kb] + \
+                conflict[ka+da] + conflict[kb+db]
+            hval = new_md + new_lc
+            if grp is not None:
+                i0 = idx[grp]
+                pdb = databases[grp]
+                new_pdb = pdb_sum - pdb[i0] + pdb[i0 ^ x]
+                mi0 = mirror_idx[mgrp]
+                pdb = databases[mgrp]
+                new_mirror = mirror_sum - pdb[mi0] + pdb[mi0 ^ mx]
+                if new_pdb > hval:
+                    hval = new_pdb
+                if new_mirror > hval:
+                    hval = new_mirror
+            else:
+                new_pdb = new_mirror = 0
+            f = g + hval
+            if f > bound:
+                if f < best:
+                    best = f
+                continue
+            path.append(t)
+            if new_md == 0:
+                return FOUND
+            cells[blank], cells[src] = t, 0
+            keys[a], keys[b] = ka+da, kb+db
+            keys[c] += dc
+            if grp is not None:
+                idx[grp] = i0 ^ x
+                mirror_idx[mgrp] = mi0 ^ mx
+            r = search(src, g, bound, blank, new_md, new_lc, new_pdb,
+                       new_mirror)
+            if r == FOUND:
+                return FOUND
+            path.pop()
+            if grp is not None:
+                idx[grp] = i0
+                mirror_idx[mgrp] = mi0
+            keys[a], keys[b] = ka, kb
+            keys[c] -= dc
+            cells[blank], cells[src] = 0, t
+            if r < best:
+                best = r
+        return best
+
+    if md == 0:
+        return path, nodes
+    bound = max(md + lc, pdb_sum, mirror_sum)
+    while True:
+        r = search(board.blank, 0, bound, None, md, lc, pdb_sum, mirror_sum)
+        if r == FOUND:
+            return path, nodes
+        bound = r
+
+
+def main(argv):
+    if "--build-pdb" in argv:
+        build_databases()
+        argv = [a for a in argv if a != "--build-pdb"]
+        if not argv:
+            return
+    size = 4
+    if "--size" in argv:
+        i = argv.index("--size")
+        size = int(argv[i+1])
+        del argv[i:i+2]
+    tiles = list(map(int, argv))
+    if len(tiles) != size*size or sorted(tiles) != list(range(size*size)):
+        sys.exit(f"expected a permutation of 0..{size*size-1}")
+    board = Board(size, size, tiles)
+    databases = load_databases() if size == 4 else None
+    start = time.perf_counter()
+    moves, nodes = solve(board, databases)
+    print(f"{len(moves)} moves: {' '.join(map(str, moves))}")
+    print(f"{nodes} nodes generated in {time.perf_counter()-start:.3f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,400 @@
+"""Tk-free editing core of the VIMish one-line editor (see LabelEdit.py)
+
+Text model, undo journal, modes and motions live here, so editing can be
+driven and measured without a display: feed key names to Editor.press.
+"""
+import bisect
+import functools
+import itertools
+from array import array, typecodes
+from collections import deque
+from enum import Enum
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# "u" is deprecated since Python 3.13 in favour of "w"
+CHAR_TYPECODE = "w" if "w" in typecodes else "u"
+
+
+class CursorMode(Enum):
+    INSERT = 0
+    COMMAND = 1
+
+
+class GapBuffer:
+    """Text storage with a gap at the last edit position
+
+    Inserts and deletions next to the previous edit are amortized O(1):
+    only the gap is moved or grown, the rest of the text stays in place.
+    Symbols are kept in a unicode array, so moving the gap is a memmove.
+    """
+    def __init__(self, text="", gap=64):
+        self.chars = array(CHAR_TYPECODE, text + "\0" * gap)
+        self.gap_start = len(text)
+        self.gap_end = len(self.chars)
+
+    def __len__(self):
+        return len(self.chars) - (self.gap_end - self.gap_start)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("GapBuffer index out of range")
+        return self.chars[i if i < self.gap_start
+                          else i + self.gap_end - self.gap_start]
+
+    def __str__(self):
+        return self.chars[:self.gap_start].tounicode() + \
+            self.chars[self.gap_end:].tounicode()
+
+    def slice(self, start, stop):
+        """Text between start and stop, O(stop-start)"""
+        stop = min(stop, len(self))
+        if start >= stop:
+            return ""
+        gap = self.gap_end - self.gap_start
+        if stop <= self.gap_start:
+            return self.chars[start:stop].tounicode()
+        if start >= self.gap_start:
+            return self.chars[start+gap:stop+gap].tounicode()
+        return self.chars[start:self.gap_start].tounicode() + \
+            self.chars[self.gap_end:stop+gap].tounicode()
+
+    def move_gap(self, i):
+        if i < self.gap_start:
+            n = self.gap_start - i
+            self.chars[self.gap_end-n:self.gap_end] = \
+                self.chars[i:self.gap_start]
+            self.gap_start, self.gap_end = i, self.gap_end - n
+        elif i > self.gap_start:
+            n = i - self.gap_start
+            self.chars[self.gap_start:self.gap_start+n] = \
+                self.chars[self.gap_end:self.gap_end+n]
+            self.gap_start, self.gap_end = i, self.gap_end + n
+
+    def insert(self, i, text):
+        self.move_gap(i)
+        if self.gap_end - self.gap_start < len(text):
+            grow = max(len(text), len(self.chars))
+            self.chars[self.gap_end:self.gap_end] = \
+                array(CHAR_TYPECODE, "\0" * grow)
+            self.gap_end += grow
+        self.chars[self.gap_start:self.gap_start+len(text)] = \
+            array(CHAR_TYPECODE, text)
+        self.gap_start += len(text)
+
+    def delete(self, i, n=1):
+        """Delete n symbols starting from i"""
+        n = min(n, len(self) - i)
+        if n > 0:
+            self.move_gap(i)
+            self.gap_end += n
+
+
+class FontMetrics:
+    """Glyph widths of a font, every symbol is measured only once
+
+    Widths are kept in a bounded LRU cache, one FontMetrics per font,
+    see FontMetrics.of.
+    """
+    _instances = {}
+
+    def __init__(self, font, maxsize=4096):
+        self.font = font
+        self.width = functools.lru_cache(maxsize=maxsize)(font.measure)
+
+    @classmethod
+    def of(cls, font):
+        key = str(font)
+        if key not in cls._instances:
+            cls._instances[key] = cls(font)
+        return cls._instances[key]
+
+    def widths(self, text):
+        return [self.width(c) for c in text]
+
+
+class MeasuredBuffer(GapBuffer):
+    """GapBuffer which also keeps x offsets of its symbols
+
+    `ends` shares the layout of `chars`, gap included: before the gap it
+    holds the x where each symbol ends, after the gap the distance from
+    there to the end of the text, whose width is `total`. So an edit at
+    the gap touches only the new symbols, moving the gap converts just the
+    moved ones, index-to-x is O(1) and x-to-index is a bisect. Offsets are
+    32 bit, enough for lines up to 2**31 pixels wide.
+    """
+    def __init__(self, text="", metrics=None, gap=64):
+        super().__init__(text, gap)
+        self.metrics = metrics
+        self.ends = array("i", itertools.accumulate(metrics.widths(text)))
+        self.total = self.ends[-1] if text else 0
+        self.ends.extend(bytes(self.ends.itemsize * gap))
+
+    def flip(self, src, dst, n):
+        """ends[dst:dst+n] = total - ends[src:src+n]
+
+        Converts offsets moved across the gap, with NumPy if installed
+        and there are enough of them to pay off.
+        """
+        if n == 0:
+            return
+        if np is not None and n > 256:
+            ends = np.frombuffer(self.ends, dtype=f"i{self.ends.itemsize}")
+            ends[dst:dst+n] = self.total - ends[src:src+n]
+            del ends
+        else:
+            total = self.total
+            self.ends[dst:dst+n] = array(
+                "i", [total - x for x in self.ends[src:src+n]])
+
+    def move_gap(self, i):
+        start, end = self.gap_start, self.gap_end
+        super().move_gap(i)
+        if i < start:
+            self.flip(i, end - (start-i), start - i)
+        elif i > start:
+            self.flip(end, start, i - start)
+
+    def insert(self, i, text):
+        x = self.x(i)
+        size = len(self.chars)
+        super().insert(i, text)
+        grow = len(self.chars) - size
+        if grow:
+            at = self.gap_end - grow
+            self.ends[at:at] = array("i", bytes(self.ends.itemsize * grow))
+        widths = self.metrics.widths(text)
+        self.ends[i:i+len(text)] = array(
+            "i", itertools.accumulate(widths, initial=x))[1:]
+        self.total += sum(widths)
+
+    def delete(self, i, n=1):
+        n = min(n, len(self) - i)
+        if n > 0:
+            removed = self.x(i+n) - self.x(i)
+            super().delete(i, n)
+            self.total -= removed
+
+    def x(self, i):
+        """x of the i-th symbol, x(len(self)) is the width of the text"""
+        if i <= 0:
+            return 0
+        if i <= self.gap_start:
+            return self.ends[i-1]
+        return self.total - self.ends[i-1 + self.gap_end - self.gap_start]
+
+    def count_before(self, x, inclusive=False):
+        """Number of indexes i, 0 <= i <= len(self), with x(i) < x
+        (or x(i) <= x if inclusive)"""
+        if x < 0 or x == 0 and not inclusive:
+            return 0
+        find = bisect.bisect_right if inclusive else bisect.bisect_left
+        count = 1 + find(self.ends, x, 0, self.gap_start)
+        if count <= self.gap_start:
+            return count
+        # after the gap ends[j] = total - x(...) decreases: keep the symbols
+        # whose end is still before x
+        lo, hi = self.gap_end, len(self.chars)
+        limit = self.total - x
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ends[mid] > limit or inclusive and self.ends[mid] == limit:
+                lo = mid + 1
+            else:
+                hi = mid
+        return count + lo - self.gap_end
+
+    def index_at(self, x):
+        """Index of the symbol under x (len(self) if x is past the text)"""
+        return max(self.count_before(x, inclusive=True) - 1, 0)
+
+
+class UndoJournal:
+    """Operation based undo/redo history with bounded memory
+
+    An entry is [kind, position, text] where kind is "insert" or "delete".
+    Consecutive inserts of one INSERT session are merged into one entry.
+    The oldest entries are evicted once there are more than max_entries
+    of them or they hold more than max_chars symbols in total.
+    """
+    def __init__(self, max_entries=1000, max_chars=1_000_000):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.chars = 0
+        self.session_open = False
+
+    def close_session(self):
+        self.session_open = False
+
+    def record(self, kind, pos, text):
+        self.redo_stack.clear()
+        last = self.undo_stack[-1] if self.undo_stack else None
+        if kind == "insert" and self.session_open and last is not None and \
+                last[0] == "insert" and last[1] + len(last[2]) == pos:
+            last[2] += text
+        else:
+            self.undo_stack.append([kind, pos, text])
+        self.session_open = kind == "insert"
+        self.chars += len(text)
+        self.evict()
+
+    def evict(self):
+        while self.undo_stack and (len(self.undo_stack) > self.max_entries
+                                   or self.chars > self.max_chars):
+            self.chars -= len(self.undo_stack.popleft()[2])
+
+    def apply(self, buffer, kind, pos, text):
+        if kind == "insert":
+            buffer.insert(pos, text)
+            return pos + len(text)
+        buffer.delete(pos, len(text))
+        return pos
+
+    def undo(self, buffer):
+        """Revert the last entry, return new cursor position or None"""
+        self.close_session()
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.chars -= len(entry[2])
+        self.redo_stack.append(entry)
+        kind, pos, text = entry
+        self.apply(buffer, "delete" if kind == "insert" else "insert",
+                   pos, text)
+        return pos
+
+    def redo(self, buffer):
+        """Repeat the last undone entry, return new cursor position or None"""
+        self.close_session()
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        self.chars += len(entry[2])
+        self.evict()
+        return self.apply(buffer, *entry)
+
+
+class Editor:
+    """Mode, cursor and text of the editor, driven by key names
+
+    Key names are Tk keysyms ("Left", "BackSpace", "a", ...), Ctrl-r is
+    "Control-r". `index` is the cursor position as a symbol index.
+    """
+    def __init__(self, text="", buffer=None, journal=None):
+        self.buffer = GapBuffer(text) if buffer is None else buffer
+        self.journal = UndoJournal() if journal is None else journal
+        self.mode = CursorMode.COMMAND
+        self.index = 0
+
+    def right_border(self):
+        """Rightmost index available in the current mode"""
+        text_len = len(self.buffer)
+        return text_len if self.mode == CursorMode.INSERT else text_len-1
+
+    def set_index(self, index):
+        self.index = max(min(index, self.right_border()), 0)
+
+    def move_left(self):
+        if self.index > 0:
+            self.index -= 1
+
+    def move_right(self):
+        if self.index < self.right_border():
+            self.index += 1
+
+    def move_home(self):
+        self.index = 0
+
+    def move_end(self):
+        self.index = max(self.right_border(), 0)
+
+    def insert(self, char):
+        self.buffer.insert(self.index, char)
+        self.journal.record("insert", self.index, char)
+        self.index += len(char)
+
+    def delete_previous(self):
+        if self.index > 0:
+            self.journal.record("delete", self.index-1,
+                                self.buffer[self.index-1])
+            self.buffer.delete(self.index-1)
+            self.index -= 1
+
+    def delete_next(self):
+        if self.index < len(self.buffer):
+            self.journal.record("delete", self.index,
+                                self.buffer[self.index])
+            self.buffer.delete(self.index)
+
+    def undo(self):
+        index = self.journal.undo(self.buffer)
+        if index is not None:
+            self.set_index(index)
+
+    def redo(self):
+        index = self.journal.redo(self.buffer)
+        if index is not None:
+            self.set_index(index)
+
+    def switch_to_INSERT(self, append=False):
+        self.mode = CursorMode.INSERT
+        if append:
+            self.move_right()
+
+    def switch_to_COMMAND(self):
+        self.mode = CursorMode.COMMAND
+        self.journal.close_session()
+        if self.index > 0 and self.index == len(self.buffer):
+            self.index -= 1
+
+    def press(self, key, char=""):
+        """Handle a key; char is the symbol it types, if any"""
+        motion = self.MOTIONS.get(key)
+        if motion is not None:
+            motion(self)
+        elif self.mode == CursorMode.COMMAND:
+            if key in ("i", "a"):
+                self.switch_to_INSERT(append=key == "a")
+            elif key == "u":
+                self.undo()
+            elif key == "Control-r":
+                self.redo()
+        elif key == "Escape":
+            self.switch_to_COMMAND()
+        elif key == "BackSpace":
+            self.delete_previous()
+        elif key == "Delete":
+            self.delete_next()
+        elif char != "" and not key.startswith("Control-"):
+            self.insert(char)
+
+    MOTIONS = {
+        "Left": move_left,
+        "Right": move_right,
+        "Home": move_home,
+        "End": move_end,
+    }
+
+
+def save_keys(path, keys):
+    """Write (key, char) pairs one per line, tab separated"""
+    with open(path, "w", encoding="utf-8") as f:
+        for key, char in keys:
+            f.write(f"{key}\t{char}\n" if char not in ("\t", "\n")
+                    else f"{key}\t\n")
+
+
+def load_keys(path):
+    """Read (key, char) pairs written by save_keys, lazily"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            key, _, char = line.rstrip("\n").partition("\t")
+            yield key, char
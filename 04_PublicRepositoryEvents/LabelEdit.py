@@ -1,100 +1,76 @@
 """Module representing custom Label class which imitates tkinter.Entry behaviour"""
+import argparse
 import tkinter as tk
 from tkinter import font as tkFont
-from enum import Enum
 
+from EditorCore import CursorMode, Editor, FontMetrics, MeasuredBuffer
 
-class CursorMode(Enum):
-    INSERT = 0
-    COMMAND = 1
+try:
+    from tkprobe import probed
+except ImportError:
+    def probed(func):
+        return func
+
+CONTROL_MASK = 0x4
 
 
 class Cursor(tk.Label):
-    """Custom cursor inside InputLabel object"""
+    """Custom cursor inside InputLabel object
+
+    Only draws the Editor state: pixel placement is derived from the
+    cursor index and the InputLabel viewport and never read back from Tk.
+    """
     def __init__(self, master, width, **kwargs):
         super().__init__(master, **kwargs)
-        self.mode = CursorMode.COMMAND
         self.width = {
             CursorMode.INSERT: 2,
             CursorMode.COMMAND: width
         }
-        self.char_width = self.width[CursorMode.COMMAND]
 
-    def set_current_symbol(self, text):
-        if self.mode == CursorMode.COMMAND:
-            symb_i = int(self.place_info()['x']) // self.char_width
-            self.configure(text=text[symb_i])
-
-    def bind_events(self):
-        self.bind_movements()
-
-    def bind_movements(self):
-        self.bind_movement_left()
-        self.bind_movement_right()
-        self.bind_Home_End_movement()
-
-    def bind_movement_left(self):
-        def move_left(arg):
-            new_x = int(self.place_info()['x']) - \
-                self.width[CursorMode.COMMAND]
-            if new_x >= 0:
-                self.place_configure(x=new_x)
-                text = self.master.textvariable.get()
-                self.set_current_symbol(text)
-        self.bind("<Left>", move_left)
-
-    def bind_movement_right(self):
-        def move_right(arg):
-            text = self.master.textvariable.get()
-            cur_x = int(self.place_info()['x'])
-            right_border = len(text)*self.char_width if self.mode == \
-                CursorMode.INSERT else (len(text)-1)*self.char_width
-            if text != '' and cur_x < right_border:
-                new_x = cur_x + \
-                    self.width[CursorMode.COMMAND]
-                if self.master.winfo_width() > \
-                    (new_x + (self.width[self.mode]
-                     if self.mode == CursorMode.COMMAND else 0)):
-                    self.place_configure(x=new_x)
-                    self.set_current_symbol(text)
-        self.bind("<Right>", move_right)
-
-    def bind_Home_End_movement(self):
-        def move_end(arg):
-            text = self.master.textvariable.get()
-            if self.mode == CursorMode.INSERT:
-                new_x = self.char_width * len(text)
-                self.place_configure(x=new_x)
-            else:
-                new_x = 0 if len(text) == 0 else \
-                    self.char_width * (len(text)-1)
-                self.place_configure(x=new_x)
-                self.set_current_symbol(text)
-
-        def move_home(arg):
-            self.place_configure(x=0)
-            text = self.master.textvariable.get()
-            self.set_current_symbol(text)
-
-        self.bind("<End>", move_end)
-        self.bind("<Home>", move_home)
+    def render(self, editor, x, width):
+        self.place_configure(x=x, width=width)
+        if editor.mode == CursorMode.INSERT:
+            self.configure(highlightthickness=1)
+        else:
+            text = editor.buffer
+            self.configure(highlightthickness=0,
+                           text=text[editor.index]
+                           if editor.index < len(text) else " ")
 
 
 class InputLabel(tk.Label):
-    """tk.Entry behaviour imitation class"""
-    def __init__(self, master, takefocus=True, highlightthickness=3, **kwargs):
+    """tk.Entry behaviour imitation class
+
+    Editing itself is done by EditorCore.Editor, the widget feeds it keys
+    and draws its state once per batch of keystrokes, on idle.
+    Only the symbols which fit into the widget are shown: the viewport
+    starts at `offset` and scrolls horizontally to keep the cursor visible,
+    so rendering cost depends on the widget width, not on the text length.
+    Symbol positions come from MeasuredBuffer offsets, so proportional
+    fonts are supported as well.
+    """
+    def __init__(self, master, takefocus=True, highlightthickness=3,
+                 width=40, **kwargs):
         super().__init__(master, takefocus=takefocus,
                          highlightthickness=highlightthickness,
-                         padx=0, pady=0,
+                         padx=0, pady=0, width=width,
                          **kwargs)
+        self.highlightthickness = highlightthickness
+        self.offset = 0
+        self.shown = None
         # this comment is to store service symbol "▯"
         self.font = kwargs['font']
 
         self.textvariable = kwargs["textvariable"]
         initial_text = kwargs["textvariable"].get()
-
-        # set pixel length of any char with such a font
-        self.char_width = self.font.measure('s')
+        self.metrics = FontMetrics.of(self.font)
+        self.editor = Editor(buffer=MeasuredBuffer(initial_text, self.metrics))
+        self.buffer = self.editor.buffer
+        self.render_scheduled = False
+
+        # cursor width on empty text, and initial viewport width
+        self.char_width = self.metrics.width('s')
+        self.view_width = width * self.char_width
         self.custom_cursor = Cursor(self,
                                     width=self.char_width,
                                     text="",
@@ -107,102 +83,74 @@ class InputLabel(tk.Label):
                                     takefocus=False)
         self.custom_cursor.place(y=0, x=0, width=self.char_width, relheight=1)
         self.bind_events()
-
+        self.schedule_render()
+
+    def schedule_render(self):
+        if not self.render_scheduled:
+            self.render_scheduled = True
+            self.after_idle(self.render)
+
+    def cursor_width(self):
+        """Width the cursor needs in its current position"""
+        editor, buffer = self.editor, self.buffer
+        if editor.mode == CursorMode.INSERT:
+            return self.custom_cursor.width[CursorMode.INSERT]
+        if editor.index >= len(buffer):
+            return self.char_width
+        return buffer.x(editor.index+1) - buffer.x(editor.index)
+
+    def scroll_to_cursor(self):
+        index, buffer = self.editor.index, self.buffer
+        if index < self.offset:
+            self.offset = index
+        else:
+            right = buffer.x(index) + self.cursor_width()
+            if right - buffer.x(self.offset) > self.view_width:
+                # leftmost offset which still shows the whole cursor
+                self.offset = min(index, buffer.count_before(
+                    right - self.view_width))
+
+    @probed
+    def render(self):
+        self.render_scheduled = False
+        self.scroll_to_cursor()
+        buffer = self.buffer
+        left = buffer.x(self.offset)
+        stop = buffer.index_at(left + self.view_width)
+        shown = buffer.slice(self.offset, stop)
+        if shown != self.shown:
+            self.shown = shown
+            self.textvariable.set(shown)
+        self.custom_cursor.render(self.editor,
+                                  buffer.x(self.editor.index) - left,
+                                  self.cursor_width())
+
+    def resize(self, event):
+        self.view_width = max(1, event.width - 2*self.highlightthickness)
+        self.schedule_render()
+
+    @probed
     def write(self, event):
-        if event.char != "" and self.custom_cursor.mode == CursorMode.INSERT:
-            symb_i = int(self.custom_cursor.place_info()['x']) // \
-                self.custom_cursor.width[CursorMode.COMMAND]
-            text = self.textvariable.get()
-            self.textvariable.set(
-                 text[:symb_i] + event.char + text[symb_i:])
-            self.update()
-            self.custom_cursor.event_generate("<Right>")
+        key = event.keysym
+        if event.state & CONTROL_MASK:
+            key = "Control-" + key
+        self.editor.press(key, event.char)
+        self.schedule_render()
 
     def bind_events(self):
-        self.custom_cursor.bind_events()
-        self.bind_movements()
-        self.bind_mode_switching_to_INSERT_or_writing()
-        self.bind_mode_switching_to_COMMAND()
         self.bind_writing()
-        self.bind_symbol_deletion()
         self.bind_mouse()
-
-    def bind_movements(self):
-        for event in ["<Left>", "<Right>", "<End>", "<Home>"]:
-            def handler(arg, event=event):
-                self.custom_cursor.focus_set()
-                self.event_generate(event)
-                self.focus_set()
-            self.bind(event, handler)
-
-    def bind_mode_switching_to_INSERT_or_writing(self):
-        def change_mode_or_write(arg, key):
-            if self.custom_cursor.mode == CursorMode.COMMAND:
-                self.custom_cursor.mode = CursorMode.INSERT
-                self.custom_cursor.place_configure(
-                    width=self.custom_cursor.width[CursorMode.INSERT])
-                self.custom_cursor.configure(highlightthickness=1)
-                if key == 'a':
-                    self.custom_cursor.event_generate("<Right>")
-            else:
-                self.write(arg)
-        self.bind("i", lambda arg: change_mode_or_write(arg, "i"), add=True)
-        self.bind("a", lambda arg: change_mode_or_write(arg, "a"), add=True)
-
-    def bind_mode_switching_to_COMMAND(self):
-        def change_mode_to_COMMAND(arg):
-            if self.custom_cursor.mode == CursorMode.INSERT:
-                self.custom_cursor.mode = CursorMode.COMMAND
-                self.custom_cursor.place_configure(
-                    width=self.custom_cursor.width[CursorMode.COMMAND])
-                self.custom_cursor.configure(highlightthickness=0)
-                symb_i = int(self.custom_cursor.place_info()['x']) // \
-                    self.custom_cursor.width[CursorMode.COMMAND]
-                text = self.textvariable.get()
-                if text == "":
-                    self.custom_cursor.configure(text=" ")
-                elif symb_i < len(text):
-                    self.custom_cursor.configure(text=f"{text[symb_i]}")
-                elif symb_i == len(text):
-                    self.custom_cursor.event_generate("<Left>")
-        self.bind("<Key-Escape>", change_mode_to_COMMAND)
+        self.bind("<Configure>", self.resize)
 
     def bind_writing(self):
         self.bind("<Any-KeyPress>", self.write, add=True)
 
-    def bind_symbol_deletion(self):
-        def del_previous_symbol(arg):
-            if self.custom_cursor.mode == CursorMode.INSERT:
-                symb_i = int(self.custom_cursor.place_info()['x']) // \
-                    self.custom_cursor.width[CursorMode.COMMAND]
-                if symb_i > 0:
-                    text = self.textvariable.get()
-                    self.textvariable.set(text[:symb_i-1]+text[symb_i:])
-                    self.custom_cursor.event_generate("<Left>")
-
-        def del_next_symbol(arg):
-            if self.custom_cursor.mode == CursorMode.INSERT:
-                symb_i = int(self.custom_cursor.place_info()['x']) // \
-                    self.custom_cursor.width[CursorMode.COMMAND]
-                text = self.textvariable.get()
-                if symb_i < len(text):
-                    self.textvariable.set(text[:symb_i]+text[symb_i+1:])
-
-        self.bind("<BackSpace>", del_previous_symbol, add=False)
-        self.bind("<Delete>", del_next_symbol, add=False)
-
     def bind_mouse(self):
         def capture_focus_and_pose_cursor(arg):
-            text = self.textvariable.get()
-            if text != "":
-                new_x = arg.x - (arg.x % self.char_width)
-                right_border = len(text)*self.char_width \
-                    if self.custom_cursor.mode == CursorMode.INSERT else \
-                    (len(text)-1)*self.char_width
-                if new_x > right_border:
-                    new_x = right_border
-                self.custom_cursor.place_configure(x=new_x)
-                self.custom_cursor.set_current_symbol(text)
+            if len(self.buffer) != 0:
+                x = self.buffer.x(self.offset) + arg.x
+                self.editor.set_index(self.buffer.index_at(x))
+                self.schedule_render()
             self.focus_set()
 
         self.bind("<Button-1>", capture_focus_and_pose_cursor, add=False)
@@ -210,7 +158,7 @@ class InputLabel(tk.Label):
 
 class App(tk.Frame):
     """Main application"""
-    def __init__(self, master=None, title="App", **kwargs):
+    def __init__(self, master=None, title="App", family="fixed", **kwargs):
         super().__init__(master, **kwargs)
         self.master.title(title)
         self.master.geometry("+500+300")
@@ -221,7 +169,7 @@ class App(tk.Frame):
         self.rowconfigure(0, weight=1)
         self.rowconfigure(1, weight=1)
         self.grid(sticky="NEWS")
-        font_obj = tkFont.Font(family="fixed", size=20)
+        font_obj = tkFont.Font(family=family, size=20)
 
         self.B1 = tk.Button(self, font=font_obj,
                             text="Quit", command=self.master.quit)
@@ -244,5 +192,10 @@ class App(tk.Frame):
         self.master.mainloop()
 
 
-app = App(title="VIMish text editor emulator")
-app.mainloop()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VIMish text editor")
+    parser.add_argument("--font", default="fixed",
+                        help="font family, proportional ones are fine too")
+    args = parser.parse_args()
+    app = App(title="VIMish text editor emulator", family=args.font)
+    app.mainloop()
@@ -0,0 +1,202 @@
+"""Benchmarks for LabelEdit widget and its editing core
+
+Run all of them via `python benchmark.py` or a single one via
+`python benchmark.py <name>`. All but `replay` require a display.
+`python benchmark.py replay --keys FILE` replays a keystroke stream saved
+by EditorCore.save_keys instead of a generated one.
+"""
+import random as rnd
+import sys
+import time
+import tracemalloc
+import tkinter as tk
+
+import EditorCore
+import LabelEdit
+
+
+def make_app():
+    root = tk.Tk()
+    app = LabelEdit.App(root, title="benchmark")
+    app.update()
+    return app
+
+
+def rate(count, func):
+    """Calls of func per second"""
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return count / (time.perf_counter() - start)
+
+
+def bench_cursor_index(count=100_000):
+    """Cursor index lookups: parsed from place_info() vs Editor.index"""
+    app = make_app()
+    cursor, editor = app.IL.custom_cursor, app.IL.editor
+    char_width = app.IL.char_width
+    before = rate(count, lambda: int(cursor.place_info()['x']) // char_width)
+    after = rate(count, lambda: editor.index)
+    print(f"place_info(): {before:12.0f} lookups/s")
+    print(f"model index:  {after:12.0f} lookups/s")
+    app.master.destroy()
+
+
+class BaselineInputLabel(tk.Label):
+    """InputLabel typing path as it was before EditorCore
+
+    The text lives in the StringVar and is rebuilt on every key, the cursor
+    index is parsed back from place_info(), the display is updated and the
+    cursor is moved by a generated <Right> event, all within the keystroke.
+    Only typing in INSERT mode is kept, it is all bench_keystrokes compares.
+    """
+    def __init__(self, master, font, textvariable, **kwargs):
+        super().__init__(master, font=font, textvariable=textvariable,
+                         takefocus=True, highlightthickness=3,
+                         padx=0, pady=0, **kwargs)
+        self.textvariable = textvariable
+        self.char_width = font.measure('s')
+        self.custom_cursor = tk.Label(self, text="", font=font,
+                                      bg="yellow", fg="brown",
+                                      relief=tk.GROOVE,
+                                      highlightbackground="green",
+                                      highlightthickness=1,
+                                      takefocus=False)
+        self.custom_cursor.place(y=0, x=0, width=2, relheight=1)
+        self.custom_cursor.bind("<Right>", self.move_right)
+        self.bind("<Any-KeyPress>", self.write, add=True)
+
+    def write(self, event):
+        if event.char != "":
+            symb_i = int(self.custom_cursor.place_info()['x']) // \
+                self.char_width
+            text = self.textvariable.get()
+            self.textvariable.set(
+                 text[:symb_i] + event.char + text[symb_i:])
+            self.update()
+            self.custom_cursor.event_generate("<Right>")
+
+    def move_right(self, arg):
+        text = self.textvariable.get()
+        cur_x = int(self.custom_cursor.place_info()['x'])
+        if text != '' and cur_x < len(text)*self.char_width:
+            new_x = cur_x + self.char_width
+            if self.winfo_width() > new_x:
+                self.custom_cursor.place_configure(x=new_x)
+
+
+def make_baseline():
+    app = make_app()
+    label = BaselineInputLabel(app, font=app.IL.font,
+                               textvariable=tk.StringVar(),
+                               width=app.IL.cget("width"),
+                               justify='left', anchor='w')
+    app.IL.grid_forget()
+    label.grid(row=0, column=0, sticky="NEWS")
+    label.focus_set()
+    app.update()
+    return app, label
+
+
+def type_keys(label, count):
+    """Typing rate of label, keys/s, until everything typed is shown"""
+    start = time.perf_counter()
+    for _ in range(count):
+        label.event_generate("<KeyPress>", keysym="x")
+    label.update()
+    return count / (time.perf_counter() - start)
+
+
+def bench_keystrokes(count=2000):
+    """Typing throughput of InputLabel before and after EditorCore, every
+    key handled to the end"""
+    app, label = make_baseline()
+    before = type_keys(label, count)
+    assert len(label.textvariable.get()) == count
+    app.master.destroy()
+
+    app = make_app()
+    label = app.IL
+    label.event_generate("<KeyPress>", keysym="i")
+    after = type_keys(label, count)
+    assert len(label.buffer) == count
+    print(f"typing, string rebuild: {before:8.0f} keys/s")
+    print(f"typing, EditorCore:     {after:8.0f} keys/s")
+    for key in ["Left", "Right"]:
+        def move(key=key):
+            label.event_generate("<KeyPress>", keysym=key)
+        print(f"{key}: {rate(count, move):.0f} keys/s")
+    app.master.destroy()
+
+
+def generate_keys(count, seed=15):
+    """Keystroke stream of a typing session: mostly typing, some motions,
+    deletions, mode switches and undo/redo"""
+    rng = rnd.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz      "
+    keys = [("i", "i")]
+    insert = True
+    while len(keys) < count:
+        r = rng.random()
+        if not insert:
+            key = rng.choice(["i", "a", "u", "Control-r", "Left", "Right",
+                              "Home", "End"])
+            keys.append((key, key if len(key) == 1 else ""))
+            insert = key in ("i", "a")
+        elif r < 0.85:
+            char = rng.choice(letters)
+            keys.append((char if char != " " else "space", char))
+        elif r < 0.93:
+            keys.append((rng.choice(["Left", "Right", "Home", "End"]), ""))
+        elif r < 0.98:
+            keys.append((rng.choice(["BackSpace", "Delete"]), ""))
+        else:
+            keys.append(("Escape", ""))
+            insert = False
+    return keys[:count]
+
+
+def replay(keys):
+    editor = EditorCore.Editor()
+    press = editor.press
+    for key, char in keys:
+        press(key, char)
+    return editor
+
+
+def bench_replay(count=1_000_000, path=None):
+    """Headless editing core: keystroke stream replay, keys/s and memory"""
+    keys = list(EditorCore.load_keys(path)) if path is not None \
+        else generate_keys(count)
+    start = time.perf_counter()
+    editor = replay(keys)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    replay(keys)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{len(keys)} keys in {elapsed:.2f}s: {len(keys)/elapsed:.0f} keys/s, "
+          f"text {len(editor.buffer)} symbols, "
+          f"undo entries {len(editor.journal.undo_stack)}, "
+          f"peak memory {peak/2**20:.1f} MiB")
+
+
+BENCHMARKS = {
+    "cursor_index": bench_cursor_index,
+    "keystrokes": bench_keystrokes,
+    "replay": bench_replay,
+}
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    path = None
+    if "--keys" in args:
+        i = args.index("--keys")
+        path = args[i+1]
+        del args[i:i+2]
+    for name in args or list(BENCHMARKS):
+        print(f"== {name}")
+        if name == "replay":
+            bench_replay(path=path)
+        else:
+            BENCHMARKS[name]()
@@ -1,8 +1,28 @@
 """Module representing basic graphics editor"""
 
+import argparse
+import itertools
+import queue
+import threading
+import time
 import tkinter as tk
+from array import array
+from tkinter import filedialog, messagebox
 from tkinter.font import Font as tkFont
 
+from ShapeModel import (ShapeStore, SpatialGrid, diff_description,
+                        inside_oval, point_cloud, read_records,
+                        store_records, write_description, write_scene)
+
+try:
+    from tkprobe import probed
+except ImportError:
+    def probed(func):
+        return func
+
+SCENE_FILETYPES = [("Binary scene", "*.ovals"), ("Description", "*.txt"),
+                   ("All files", "*")]
+
 class Application(tk.Frame):
     '''Sample tkinter application class'''
 
@@ -28,26 +48,25 @@ class Application(tk.Frame):
         '''Bind events to the widgets'''
 
 
-class OvalProperties:
-    def __init__(self, canvas, oval_id):
-        self.x0, self.y0, self.x1, self.y1 = canvas.coords(oval_id)
-        self.border_width = canvas.itemcget(oval_id, "width")
-        self.fill_color = canvas.itemcget(oval_id, "fill")
-        self.border_color = canvas.itemcget(oval_id, "outline")
-        self.oval_id = oval_id
+class App(Application):
+    """Main application
 
-    def __str__(self):
-        return f"OVAL {self.oval_id} -> "\
-                f"[coords:{self.x0},{self.y0},{self.x1},{self.y1} | "\
-                f"border_width:{self.border_width} | "\
-                f"fill_color:{self.fill_color} | "\
-                f"border_color:{self.border_color}]\n"
-    def __repr__(self):
-        return self.__str__()
+    Dragging is applied at most `frame_rate` times per second: motion
+    events only remember the pointer position.
 
+    Ovals live in the model (world coordinates); the canvas is a view of it
+    which can be panned (middle button, arrows) and zoomed (wheel, +/-).
+    Canvas items exist only for the ovals in sight; if there are more than
+    `lod_limit` of them, a single point cloud image is drawn instead.
+    """
+    def __init__(self, master=None, title="<application>", frame_rate=60,
+                 load_chunk_size=2000, lod_limit=5000, **kwargs):
+        self.frame_ms = max(1, round(1000 / frame_rate))
+        self.load_chunk_size = load_chunk_size
+        self.load_job = None
+        self.lod_limit = lod_limit
+        super().__init__(master, title, **kwargs)
 
-class App(Application):
-    """Main application"""
     def set_font(self,size=20):
         return tkFont(family="fixed", size=size)
     def create_widgets(self):
@@ -59,6 +78,12 @@ class App(Application):
         self.Upd = tk.Button(self.button_frame, text="Update canvas", font=self.set_font(20),
                              command=self.handle_changes)
         self.Upd.grid(row=0,column=1)
+        self.Save = tk.Button(self.button_frame, text="Save", font=self.set_font(20),
+                              command=self.save)
+        self.Save.grid(row=0,column=2)
+        self.Load = tk.Button(self.button_frame, text="Load", font=self.set_font(20),
+                              command=self.load)
+        self.Load.grid(row=0,column=3)
 
         self.workarea_frame = tk.LabelFrame(self, text='Draw & Watch', font=self.set_font(14))
         self.workarea_frame.grid(row=0, column=0, sticky="NEWS")
@@ -69,11 +94,37 @@ class App(Application):
         self.C = tk.Canvas(self.workarea_frame, bg='lavender', width="15c", height="15c")
         self.default_oval_width = 1
         self.default_oval_height = 1
-        self.ovals = {}
+        self.ovals = ShapeStore()
+        # bounding boxes of the ovals, for hit-testing without Tcl calls
+        self.oval_index = SpatialGrid()
+        # view: canvas point (x, y) shows world point view + (x, y)/zoom
+        self.zoom = 1.0
+        self.view_x, self.view_y = 0.0, 0.0
+        self.item_of = {}
+        self.render_job = None
+        self.lod_item = None
+        self.lod_image = None
+        self.pan_from = None
+        self.rgb_of = {}
         self.oval_creation = False
         self.oval_movement= False
+        self.active_oval = None
+        self.pending_motion = None
+        self.drag_job = None
         self.last_x, self.last_y = None, None
-        self.description = None
+        # description line of every oval and the text last synced with
+        # the canvas, per line
+        self.line_of = {}
+        self.synced_lines = []
+        self.line_owners = []
+        # description update in progress: worker results, text snapshot;
+        # ovals to describe once it is over or the user edits are applied
+        self.parse_results = None
+        self.parse_lines = None
+        self.parse_owners = None
+        self.parse_job = None
+        self.undescribed = {}
+        self.reparse = False
 
         for O in [self.C, self.T]:
             O.grid(row=0, column=self.workarea_frame.grid_size()[1])
@@ -82,148 +133,501 @@ class App(Application):
         self.C.bind("<Button-1>", lambda e: self.C.focus_set(), add=True)
         # self.C.bind("<Any-KeyPress>", print, add=True)
         self.bind_Canvas()
-        self.bind_Text()
 
     def bind_Canvas(self):
         self.bind_oval()
+        self.bind_view()
 
-    def bind_oval(self):
-        def is_inside_oval(oval_id,x,y):
-            x0,y0,x1,y1 = self.C.coords(oval_id)
-            a = (x1-x0)/2
-            b = (y1-y0)/2
-            xc = x0 + a
-            yc = y0 + b
-            local_x = x - xc
-            local_y = yc - y
-            return ((local_x**2)/(a**2) + (local_y**2)/(b**2) - 1) <= 0
+    def to_world(self, x, y):
+        return self.view_x + x/self.zoom, self.view_y + y/self.zoom
+
+    def to_canvas(self, box):
+        x0, y0, x1, y1 = box
+        z = self.zoom
+        return ((x0-self.view_x)*z, (y0-self.view_y)*z,
+                (x1-self.view_x)*z, (y1-self.view_y)*z)
+
+    def visible_box(self):
+        return (*self.to_world(0, 0),
+                *self.to_world(self.C.winfo_width(), self.C.winfo_height()))
+
+    def set_view(self, zoom, view_x, view_y):
+        """Change the view, existing canvas items are adjusted at once"""
+        if self.item_of:
+            factor = zoom / self.zoom
+            self.C.scale("oval", 0, 0, factor, factor)
+            self.C.move("oval", (self.view_x-view_x)*zoom,
+                        (self.view_y-view_y)*zoom)
+        self.zoom, self.view_x, self.view_y = zoom, view_x, view_y
+        self.schedule_render()
+
+    def zoom_at(self, x, y, factor):
+        """Zoom keeping world point under canvas point (x, y) in place"""
+        world_x, world_y = self.to_world(x, y)
+        zoom = min(max(self.zoom*factor, 1/256), 256)
+        self.set_view(zoom, world_x - x/zoom, world_y - y/zoom)
+
+    def pan(self, dx, dy):
+        """Scroll the view by (dx, dy) canvas pixels"""
+        self.set_view(self.zoom, self.view_x - dx/self.zoom,
+                      self.view_y - dy/self.zoom)
+
+    def bind_view(self):
+        def start_pan(event):
+            self.pan_from = event.x, event.y
 
+        def drag_pan(event):
+            if self.pan_from is not None:
+                self.pan(event.x - self.pan_from[0], event.y - self.pan_from[1])
+                self.pan_from = event.x, event.y
+
+        def wheel(event):
+            up = event.num == 4 or event.delta > 0
+            self.zoom_at(event.x, event.y, 1.25 if up else 0.8)
+
+        def key_zoom(factor):
+            return lambda event: self.zoom_at(self.C.winfo_width()/2,
+                                              self.C.winfo_height()/2, factor)
+
+        self.C.bind("<ButtonPress-2>", start_pan, add=True)
+        self.C.bind("<B2-Motion>", drag_pan, add=True)
+        self.C.bind("<MouseWheel>", wheel, add=True)
+        self.C.bind("<Button-4>", wheel, add=True)
+        self.C.bind("<Button-5>", wheel, add=True)
+        for key, dx, dy in [("<Left>", 50, 0), ("<Right>", -50, 0),
+                            ("<Up>", 0, 50), ("<Down>", 0, -50)]:
+            self.C.bind(key, lambda e, dx=dx, dy=dy: self.pan(dx, dy), add=True)
+        for key, factor in [("<plus>", 1.25), ("<KP_Add>", 1.25),
+                            ("<minus>", 0.8), ("<KP_Subtract>", 0.8)]:
+            self.C.bind(key, key_zoom(factor), add=True)
+        self.C.bind("<Configure>", lambda e: self.schedule_render(), add=True)
+
+    def check_color(self, color):
+        """RGB bytes of a Tk color, TclError if there is no such color"""
+        rgb = self.rgb_of.get(color)
+        if rgb is None:
+            if color == "":
+                rgb = self.check_color(self.C.cget("bg"))
+            else:
+                rgb = bytes(v >> 8 for v in self.winfo_rgb(color))
+            self.rgb_of[color] = rgb
+        return rgb
+
+    def show_oval(self, oval_id):
+        """Create the canvas item of an oval unless it exists"""
+        if oval_id not in self.item_of:
+            props = self.ovals[oval_id]
+            self.item_of[oval_id] = self.C.create_oval(
+                *self.to_canvas(props.box()), width=props.border_width,
+                fill=props.fill_color, outline=props.border_color,
+                tags="oval")
+
+    def schedule_render(self):
+        if self.render_job is None:
+            self.render_job = self.after_idle(self.render)
+
+    @probed
+    def render(self):
+        """Bring canvas items in line with the ovals in sight"""
+        self.render_job = None
+        oval_ids = self.ovals.in_box(self.visible_box(), self.oval_index)
+        if len(oval_ids) > self.lod_limit:
+            # the oval being dragged keeps its item
+            active = self.item_of.get(self.active_oval)
+            if active is not None:
+                self.C.dtag(active, "oval")
+            self.C.delete("oval")
+            self.item_of.clear()
+            if active is not None:
+                self.C.addtag_withtag("oval", active)
+                self.item_of[self.active_oval] = active
+            colors = [self.check_color(c) for c in self.ovals.colors.values]
+            self.lod_image = tk.PhotoImage(data=point_cloud(
+                self.ovals, oval_ids, self.view_x, self.view_y, self.zoom,
+                self.C.winfo_width(), self.C.winfo_height(), colors,
+                self.check_color(self.C.cget("bg"))))
+            if self.lod_item is None:
+                self.lod_item = self.C.create_image(0, 0, anchor=tk.NW,
+                                                    tags="lod")
+                self.C.tag_lower("lod")
+            self.C.itemconfigure(self.lod_item, image=self.lod_image)
+            return
+        if self.lod_item is not None:
+            self.C.delete(self.lod_item)
+            self.lod_item = self.lod_image = None
+        visible = set(oval_ids)
+        for oval_id in list(self.item_of):
+            if oval_id not in visible and oval_id != self.active_oval:
+                self.C.delete(self.item_of.pop(oval_id))
+        for oval_id in oval_ids:
+            self.show_oval(oval_id)
+
+    def find_oval(self, x, y):
+        """Topmost oval containing the point or None
+
+        Only ovals whose bounding box contains the point are tested exactly.
+        """
+        hits = [oval_id for oval_id in self.oval_index.query_point(x, y)
+                if inside_oval(self.ovals.box(oval_id), x, y)]
+        return max(hits, default=None)
+
+    def bind_oval(self):
         def handle_press(event):
-            i,inside = 0,False
-            oval_ids = list(self.ovals.keys())
-            while i < len(oval_ids) and not inside:
-                inside = is_inside_oval(oval_ids[i], event.x, event.y)
-                i += 1
-            if not inside:
+            x, y = self.to_world(event.x, event.y)
+            self.active_oval = self.find_oval(x, y)
+            if self.active_oval is None:
                 # print(f"oval created, event:{event}")
                 self.oval_creation = True
-                oval_id = self.C.create_oval(event.x, event.y,
-                                             event.x+self.default_oval_width,
-                                             event.y+self.default_oval_height,
-                                             fill='green',
-                                             outline="midnightblue")
-                self.ovals[oval_id] = OvalProperties(self.C, oval_id)
-            elif inside:
+                oval_id = self.ovals.add(
+                    (x, y, x + self.default_oval_width/self.zoom,
+                     y + self.default_oval_height/self.zoom),
+                    fill='green', outline="midnightblue")
+                self.oval_index.insert(oval_id, self.ovals.box(oval_id))
+                self.active_oval = oval_id
+            else:
                 self.oval_movement = True
                 self.last_x, self.last_y = event.x, event.y
+            self.show_oval(self.active_oval)
 
         def handle_motion(event):
-            if len(self.ovals) != 0:
-                if self.oval_creation:
-                    oval_id = sorted(self.ovals.keys())[-1]
-                    x0,y0,x1,y1 = self.C.coords(oval_id)
-                    scale_x = (event.x-x0) / (x1-x0)
-                    scale_y = (event.y-y0) / (y1-y0)
-                    if scale_x > 1.0 and scale_y > 1.0:
-                        self.C.scale(oval_id, x0,y0, scale_x, scale_y)
-                        _,_,x1,y1 = self.C.coords(oval_id)
-                        self.ovals[oval_id].x1 = x1
-                        self.ovals[oval_id].y1 = y1
-                elif self.oval_movement:
-                    oval_id = self.C.find_closest(event.x, event.y)[0]
-                    if is_inside_oval(oval_id, event.x, event.y):
-                        diff_x = event.x - self.last_x
-                        diff_y = event.y - self.last_y
-                        self.C.move(oval_id, diff_x, diff_y)
-                        self.ovals[oval_id].x0 += diff_x
-                        self.ovals[oval_id].x1 += diff_x
-                        self.ovals[oval_id].y0 += diff_y
-                        self.ovals[oval_id].y1 += diff_y
-
-                    self.last_x = event.x
-                    self.last_y = event.y
+            # only the latest pointer position matters, it is applied once
+            # per frame however many motion events come in between
+            if self.active_oval is not None:
+                self.pending_motion = event.x, event.y
+                if self.drag_job is None:
+                    self.drag_job = self.after(self.frame_ms, self.apply_drag)
 
         def handle_release(event):
+            if self.drag_job is not None:
+                self.after_cancel(self.drag_job)
+                self.apply_drag()
+            if self.active_oval is not None:
+                self.describe_oval(self.active_oval)
+            self.active_oval = None
             self.oval_creation = False
             self.oval_movement = False
-            self.describe_canvas()
 
         self.C.bind("<ButtonPress-1>", handle_press, add=True)
         self.C.bind("<Motion>", handle_motion, add=True)
         self.C.bind("<ButtonRelease-1>", handle_release, add=True)
 
+    def apply_drag(self):
+        """Apply the latest pointer position to the active oval"""
+        self.drag_job = None
+        if self.pending_motion is None or self.active_oval is None:
+            return
+        x, y = self.pending_motion
+        self.pending_motion = None
+        oval_id = self.active_oval
+        props = self.ovals[oval_id]
+        self.show_oval(oval_id)
+        item = self.item_of[oval_id]
+        if self.oval_creation:
+            # ovals only grow while being drawn
+            x, y = self.to_world(x, y)
+            if x > props.x1 and y > props.y1:
+                props.x1, props.y1 = x, y
+                self.C.coords(item, *self.to_canvas(props.box()))
+            else:
+                return
+        elif self.oval_movement:
+            diff_x = x - self.last_x
+            diff_y = y - self.last_y
+            self.last_x, self.last_y = x, y
+            self.C.move(item, diff_x, diff_y)
+            self.ovals.move([oval_id], diff_x/self.zoom, diff_y/self.zoom)
+        self.oval_index.update(oval_id, props.box())
+
     def describe_canvas(self):
+        """Rewrite the whole description, one line per oval"""
         self.T.delete(1.0, tk.END)
-        for oi, props in self.ovals.items():
-            self.T.insert(tk.END, str(props))
-        self.description = self.T.get(1.0, tk.END)
+        self.T.edit_modified(False)
+        self.synced_lines = []
+        self.line_owners = []
+        self.line_of = {}
+        self.undescribed = {}
+        self.describe_ovals(list(self.ovals))
+
+    def can_describe(self):
+        """Whether description lines are where the last sync left them
+
+        Not while an update is running or the user has edited the text
+        without applying it: ovals are described after the next update.
+        """
+        return self.parse_results is None and not self.T.edit_modified()
+
+    @probed
+    def describe_oval(self, oval_id):
+        """Rewrite only the description line of the oval, or append one"""
+        if not self.can_describe():
+            self.undescribed[oval_id] = True
+            return
+        line = self.line_of.get(oval_id)
+        if line is None or line > len(self.synced_lines):
+            self.describe_ovals([oval_id])
+            return
+        text = str(self.ovals[oval_id]).rstrip('\n')
+        modified = self.T.edit_modified()
+        self.T.delete(f"{line}.0", f"{line}.end")
+        self.T.insert(f"{line}.0", text)
+        self.T.tag_remove("incorrect_line", f"{line}.0", f"{line}.end")
+        self.synced_lines[line-1] = text
+        self.line_owners[line-1] = oval_id
+        # user edits which are not applied yet still have to be noticed
+        self.T.edit_modified(modified)
+
+    def describe_ovals(self, oval_ids):
+        """Append description lines of the ovals with one insert"""
+        if not oval_ids:
+            return
+        if not self.can_describe():
+            self.undescribed.update(dict.fromkeys(oval_ids, True))
+            return
+        texts = [str(self.ovals[oval_id]).rstrip('\n') for oval_id in oval_ids]
+        modified = self.T.edit_modified()
+        line, column = map(int, self.T.index("end-1c").split('.'))
+        if column != 0:
+            self.T.insert(tk.END, '\n')
+            line += 1
+        self.T.insert(tk.END, '\n'.join(texts) + '\n')
+        while len(self.synced_lines) < line-1:
+            self.synced_lines.append(None)
+            self.line_owners.append(None)
+        # sync state of lines which are not in the text any more
+        for oval_id in self.line_owners[line-1:]:
+            if oval_id is not None and self.line_of.get(oval_id, 0) >= line:
+                del self.line_of[oval_id]
+        del self.synced_lines[line-1:], self.line_owners[line-1:]
+        self.synced_lines.extend(texts)
+        self.line_owners.extend(oval_ids)
+        for oval_id in oval_ids:
+            self.line_of[oval_id] = line
+            line += 1
+        self.T.edit_modified(modified)
+
+    def save(self, path=None):
+        """Save the scene: description text for .txt files, binary otherwise"""
+        path = path or filedialog.asksaveasfilename(
+            defaultextension=".ovals", filetypes=SCENE_FILETYPES)
+        if not path:
+            return
+        if path.endswith(".txt"):
+            write_description(path, store_records(self.ovals))
+        else:
+            write_scene(path, self.ovals)
+
+    def load(self, path=None):
+        """Replace the scene with one from a file
+
+        Ovals are created `load_chunk_size` at a time, the window keeps
+        handling events between the chunks.
+        """
+        path = path or filedialog.askopenfilename(filetypes=SCENE_FILETYPES)
+        if not path:
+            return
+        if self.load_job is not None:
+            self.after_cancel(self.load_job)
+        self.cancel_description()
+        self.C.delete("all")
+        self.item_of.clear()
+        self.lod_item = self.lod_image = None
+        self.ovals.clear()
+        self.oval_index = SpatialGrid()
+        self.describe_canvas()
+        self.load_chunk(read_records(path))
+
+    def load_chunk(self, records):
+        created = []
+        try:
+            for _, box, width, fill, outline in \
+                    itertools.islice(records, self.load_chunk_size):
+                self.check_color(fill)
+                self.check_color(outline)
+                oval_id = self.ovals.add(box, width, fill, outline)
+                self.oval_index.insert(oval_id, box)
+                created.append(oval_id)
+        except (OSError, ValueError, tk.TclError) as e:
+            self.load_job = None
+            messagebox.showerror("Load failed", str(e))
+            return
+        finally:
+            self.describe_ovals(created)
+            self.schedule_render()
+        if len(created) == self.load_chunk_size:
+            self.load_job = self.after(1, self.load_chunk, records)
+        else:
+            self.load_job = None
+            self.T.edit_reset()
 
     def update_oval_properties(self, oval_id):
         props = self.ovals[oval_id]
-        self.C.itemconfigure(oval_id,
-                             width=props.border_width,
-                             fill=props.fill_color,
-                             outline=props.border_color)
-        # print([props.x0, props.y0, props.x1, props.y1])
-        x0,y0,x1,y1 = self.C.coords(oval_id)
-        if [x0,y0,x1,y1] != [props.x0, props.y0, props.x1, props.y1]:
-            scale_x = (props.x1 - props.x0) / (x1 - x0)
-            scale_y = (props.y1 - props.y0) / (y1 - y0)
-            self.C.scale(oval_id, x0, y0, scale_x, scale_y)
-            x0, y0, x1, y1 = self.C.coords(oval_id)
-            self.C.move(oval_id, props.x0-x0, props.y0-y0)
-            # print(self.C.coords(oval_id))
+        item = self.item_of.get(oval_id)
+        if item is not None:
+            self.C.itemconfigure(item,
+                                 width=props.border_width,
+                                 fill=props.fill_color,
+                                 outline=props.border_color)
+            self.C.coords(item, *self.to_canvas(props.box()))
+        self.oval_index.update(oval_id, props.box())
+        self.schedule_render()
 
+    @probed
     def draw_description(self):
-        def handle_desc_line(line):
-            oval_spec, prop_spec = line.strip('\n').split('->')
-            oval_id = int(oval_spec.split(' ')[1])
-            # print(f"{oval_id=}")
-            oval_props = self.ovals[oval_id]
-            for s_pr in prop_spec.strip(' ')[1:-1].split(" | "):
-                name, val = s_pr.split(":")
-                # print(f"{name=} {val=}")
-                if name == 'coords':
-                    oval_props.x0, oval_props.y0, oval_props.x1, oval_props.y1 = \
-                        list(map(float,val.split(',')))
+        """Apply the description lines changed since the last sync
+
+        Lines are diffed and parsed by ShapeModel.diff_description in a
+        worker thread, on a snapshot of the text. Results come back through
+        a queue polled with after: first the owners of the lines matched
+        with the synced text, then chunks of parsed lines, which are
+        applied to the canvas at most a frame's worth of time per poll, so
+        the window stays responsive on large descriptions. Canvas changes
+        made meanwhile are described once the update is over.
+        """
+        lines = self.T.get(1.0, "end-1c").split('\n')
+        self.T.edit_modified(False)
+        rows = array('q', self.ovals.row_of)
+        known = lambda oval_id: 0 <= oval_id < len(rows) and rows[oval_id] >= 0
+        self.parse_lines = lines
+        self.parse_owners = None
+        self.parse_results = queue.Queue()
+        threading.Thread(target=parse_worker, daemon=True,
+                         args=(lines, self.synced_lines,
+                               list(self.line_owners), known,
+                               self.parse_results)).start()
+        self.parse_job = self.after(self.frame_ms, self.poll_description)
+
+    def poll_description(self):
+        self.parse_job = None
+        finished = False
+        try:
+            deadline = time.perf_counter() + self.frame_ms/1000
+            while time.perf_counter() < deadline:
+                try:
+                    result = self.parse_results.get_nowait()
+                except queue.Empty:
+                    break
+                if result is None:
+                    finished = True
+                    break
+                if self.parse_owners is None:
+                    self.parse_owners = result
                 else:
-                    type = float if val.replace('.','').isnumeric() else str
-                    if name not in oval_props.__dict__:
-                        raise KeyError
-                    oval_props.__dict__[name] = type(val)
-            # print(f"{oval_props=}")
-            return oval_id
-
-        lines = self.T.get(1.0,tk.END).split('\n')
-        # assert len(lines) == len(self.ovals), f"{len(lines)=} {len(self.ovals)=}"
-        i = 0
-        handled_oval_ids = []
-        # print(lines)
-        while i < len(lines):
+                    self.apply_description(*result)
+        finally:
+            # an update must not get stuck whatever a chunk raised
+            if finished:
+                self.finish_description()
+            elif self.parse_results is not None:
+                self.parse_job = self.after(self.frame_ms,
+                                            self.poll_description)
+
+    @probed
+    def apply_description(self, dirty, updates, errors):
+        """Apply a chunk of parsed lines and highlight the incorrect ones"""
+        owners = self.parse_owners
+        for i in dirty:
+            owners[i] = None
+        for i, oval_id, changes in updates:
             try:
-                oval_id = handle_desc_line(lines[i])
-                if oval_id in handled_oval_ids:
-                    raise ValueError("Repeated oval_id in the description!")
-                handled_oval_ids.append(oval_id)
+                # validated before the oval is changed
+                for name in ("fill_color", "border_color"):
+                    if name in changes:
+                        self.check_color(changes[name])
+                oval_props = self.ovals[oval_id]
+            except (KeyError, tk.TclError):
+                errors.append(i)
+                continue
+            old = {name: getattr(oval_props, name) for name in changes}
+            try:
+                for name, value in changes.items():
+                    setattr(oval_props, name, value)
+                self.update_oval_properties(oval_id)
+            except (ValueError, OverflowError, tk.TclError):
+                for name, value in old.items():
+                    setattr(oval_props, name, value)
                 self.update_oval_properties(oval_id)
-            except Exception as e:
-                # print(e)
-                # print(f'line {i}')
-                self.T.tag_add("incorrect_line", f"{i+1}.0", f"{i+1}.end")
-                self.T.tag_config("incorrect_line", background="orange red")
+                errors.append(i)
             else:
-                self.T.tag_remove("incorrect_line", f"{i+1}.0", f"{i+1}.end")
-            i += 1
+                owners[i] = oval_id
+        for first, last in line_ranges(dirty):
+            self.T.tag_remove("incorrect_line", f"{first+1}.0", f"{last+1}.end")
+        for first, last in line_ranges(sorted(errors)):
+            self.T.tag_add("incorrect_line", f"{first+1}.0", f"{last+1}.end")
+        self.T.tag_config("incorrect_line", background="orange red")
+
+    def finish_description(self):
+        # without owners the worker failed: the last sync stays in force
+        if self.parse_owners is not None:
+            self.synced_lines = self.parse_lines
+            self.line_owners = self.parse_owners
+            self.line_of = {oval_id: i+1 for i, oval_id
+                            in enumerate(self.line_owners)
+                            if oval_id is not None}
+        self.parse_results = self.parse_lines = self.parse_owners = None
+        self.describe_pending()
+        if self.reparse:
+            self.reparse = False
+            self.handle_changes()
+
+    def describe_pending(self):
+        """Describe the ovals changed while the text could not be written"""
+        undescribed, self.undescribed = self.undescribed, {}
+        for oval_id in undescribed:
+            if oval_id in self.ovals:
+                self.describe_oval(oval_id)
+
+    def cancel_description(self):
+        """Drop the results of a running update, the worker just finishes"""
+        if self.parse_job is not None:
+            self.after_cancel(self.parse_job)
+            self.parse_job = None
+        self.parse_results = self.parse_lines = self.parse_owners = None
+        self.undescribed = {}
+        self.reparse = False
 
     def handle_changes(self):
-        if self.description != self.T.get(1.0,tk.END):
+        if self.parse_results is not None:
+            # run again when the current update is over
+            self.reparse = True
+        elif self.T.edit_modified():
             self.draw_description()
+        else:
+            self.describe_pending()
+
+
+def parse_worker(lines, synced_lines, line_owners, known, results):
+    """Post the line owners and diff_description chunks to the results
+    queue, then None"""
+    try:
+        owners, chunks = diff_description(lines, synced_lines, line_owners,
+                                          known)
+        results.put(owners)
+        for chunk in chunks:
+            results.put(chunk)
+    finally:
+        results.put(None)
+
 
-    def bind_Text(self):
-        def update_description(event):
-            self.description = self.T.get(1.0, tk.END)
-        self.T.bind("<Any-KeyPress>", update_description)
+def line_ranges(indexes):
+    """(first, last) pairs of runs of consecutive sorted indexes"""
+    ranges = []
+    for i in indexes:
+        if ranges and ranges[-1][1] == i-1:
+            ranges[-1][1] = i
+        else:
+            ranges.append([i, i])
+    return ranges
 
 
-app = App(title="GraphicsEditor `Don't look at me like that`")
-app.mainloop()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Oval graphics editor")
+    parser.add_argument("--fps", type=int, default=60,
+                        help="canvas updates per second while dragging")
+    parser.add_argument("scene", nargs="?",
+                        help="binary scene or description text to load")
+    args = parser.parse_args()
+    app = App(title="GraphicsEditor `Don't look at me like that`",
+              frame_rate=args.fps)
+    if args.scene:
+        app.load(args.scene)
+    app.mainloop()
@@ -0,0 +1,574 @@
+"""Tk-free shape model of the graphics editor (see GraphicsEditor.py)"""
+import difflib
+import math
+import mmap
+import struct
+from array import array
+from collections import defaultdict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def inside_oval(box, x, y):
+    """Whether point (x, y) lies inside the oval inscribed into box"""
+    x0, y0, x1, y1 = box
+    a = (x1-x0)/2
+    b = (y1-y0)/2
+    if a <= 0 or b <= 0:
+        return False
+    local_x = x - (x0 + a)
+    local_y = (y0 + b) - y
+    return ((local_x**2)/(a**2) + (local_y**2)/(b**2) - 1) <= 0
+
+
+class SpatialGrid:
+    """Uniform grid over bounding boxes of shapes
+
+    Every box is registered in all the grid cells it overlaps, so a point
+    query only looks at the shapes of one cell: expected O(1) for shapes
+    not much larger than a cell, whatever the number of shapes is.
+    Boxes covering more than `max_cells` cells are kept aside in `large`
+    and checked one by one, so huge shapes cost the same as small ones to
+    insert and move. Box queries covering more cells than there are boxes
+    scan the boxes instead of the cells.
+    """
+    def __init__(self, cell=64, max_cells=64):
+        self.cell = cell
+        self.max_cells = max_cells
+        self.cells = defaultdict(set)
+        self.boxes = {}
+        self.large = set()
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def cell_range(self, box):
+        x0, y0, x1, y1 = box
+        c = self.cell
+        return (int(min(x0, x1) // c), int(min(y0, y1) // c),
+                int(max(x0, x1) // c), int(max(y0, y1) // c))
+
+    @staticmethod
+    def cell_count(cell_range):
+        cx0, cy0, cx1, cy1 = cell_range
+        return (cx1-cx0+1) * (cy1-cy0+1)
+
+    def insert(self, key, box):
+        self.boxes[key] = tuple(box)
+        cell_range = self.cell_range(box)
+        if self.cell_count(cell_range) > self.max_cells:
+            self.large.add(key)
+            return
+        cx0, cy0, cx1, cy1 = cell_range
+        for cx in range(cx0, cx1+1):
+            for cy in range(cy0, cy1+1):
+                self.cells[cx, cy].add(key)
+
+    def remove(self, key):
+        box = self.boxes.pop(key)
+        if key in self.large:
+            self.large.discard(key)
+            return
+        cx0, cy0, cx1, cy1 = self.cell_range(box)
+        for cx in range(cx0, cx1+1):
+            for cy in range(cy0, cy1+1):
+                keys = self.cells[cx, cy]
+                keys.discard(key)
+                if not keys:
+                    del self.cells[cx, cy]
+
+    def update(self, key, box):
+        if self.cell_range(self.boxes[key]) == self.cell_range(box) or \
+                key in self.large and \
+                self.cell_count(self.cell_range(box)) > self.max_cells:
+            self.boxes[key] = tuple(box)
+        else:
+            self.remove(key)
+            self.insert(key, box)
+
+    def query_point(self, x, y):
+        """Keys of the boxes containing point (x, y)"""
+        keys = self.cells.get((int(x // self.cell), int(y // self.cell)), ())
+        result = []
+        for group in (keys, self.large):
+            for key in group:
+                x0, y0, x1, y1 = self.boxes[key]
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    result.append(key)
+        return result
+
+    def query_box(self, box):
+        """Keys of the boxes intersecting box"""
+        bx0, by0, bx1, by1 = box
+        cell_range = self.cell_range(box)
+        if self.cell_count(cell_range) > len(self.boxes):
+            candidates = self.boxes
+        else:
+            cx0, cy0, cx1, cy1 = cell_range
+            candidates = set(self.large)
+            for cx in range(cx0, cx1+1):
+                for cy in range(cy0, cy1+1):
+                    candidates.update(self.cells.get((cx, cy), ()))
+        result = []
+        for key in candidates:
+            x0, y0, x1, y1 = self.boxes[key]
+            if x0 <= bx1 and bx0 <= x1 and y0 <= by1 and by0 <= y1:
+                result.append(key)
+        return result
+
+
+DESCRIPTION_FIELDS = ("border_width", "fill_color", "border_color")
+
+
+def parse_oval_line(line):
+    """Oval id and properties from a line of the canvas description
+
+    Lines look like OvalProperties.__str__ output:
+    `OVAL 1 -> [coords:0,0,10,10 | border_width:1.0 | fill_color:green | ...]`.
+    Raises ValueError or KeyError on malformed lines, coordinates have to
+    be finite and the border width finite and non-negative.
+    """
+    oval_spec, prop_spec = line.strip('\n').split('->')
+    oval_id = int(oval_spec.split(' ')[1])
+    props = {}
+    for s_pr in prop_spec.strip(' ')[1:-1].split(" | "):
+        name, val = s_pr.split(":")
+        if name == 'coords':
+            props["x0"], props["y0"], props["x1"], props["y1"] = \
+                map(float, val.split(','))
+            if not all(map(math.isfinite, (props["x0"], props["y0"],
+                                           props["x1"], props["y1"]))):
+                raise ValueError(f"coordinates are not finite: {val}")
+        elif name == 'border_width':
+            props[name] = float(val)
+            if not 0 <= props[name] < math.inf:
+                raise ValueError(f"bad border width: {val}")
+        elif name in DESCRIPTION_FIELDS:
+            props[name] = val
+        else:
+            raise KeyError(name)
+    return oval_id, props
+
+
+class Palette:
+    """Interned values (colors, border widths) and their integer codes"""
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ShapeStore:
+    """Ovals stored column-wise: struct of arrays instead of an object each
+
+    Coordinates are array('d') columns, border widths and colors are codes
+    of interned values. `ids` maps rows to oval ids and `row_of` ids to rows
+    (-1 for missing ids): ids are small and dense (canvas item ids or
+    allocated by add), so an array indexed by id is much smaller than
+    a dict. `store[oval_id]` is an OvalProperties view of one oval.
+    """
+    def __init__(self):
+        self.x0, self.y0 = array('d'), array('d')
+        self.x1, self.y1 = array('d'), array('d')
+        self.width = array('I')
+        self.fill = array('I')
+        self.outline = array('I')
+        self.ids = array('q')
+        self.row_of = array('q')
+        self.widths = Palette()
+        self.colors = Palette()
+        self.next_id = 1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, oval_id):
+        return 0 <= oval_id < len(self.row_of) and self.row_of[oval_id] >= 0
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __getitem__(self, oval_id):
+        if oval_id not in self:
+            raise KeyError(oval_id)
+        return OvalProperties(self, oval_id)
+
+    def add(self, box, width=1.0, fill="green", outline="midnightblue",
+            oval_id=None):
+        """Append an oval, return its id (a new one unless given)"""
+        if oval_id is None:
+            oval_id = self.next_id
+        elif oval_id in self:
+            raise KeyError(f"oval {oval_id} already exists")
+        self.next_id = max(self.next_id, oval_id+1)
+        if oval_id >= len(self.row_of):
+            self.row_of.extend([-1] * (oval_id + 1 - len(self.row_of)))
+        self.row_of[oval_id] = len(self.ids)
+        self.ids.append(oval_id)
+        x0, y0, x1, y1 = box
+        self.x0.append(x0)
+        self.y0.append(y0)
+        self.x1.append(x1)
+        self.y1.append(y1)
+        self.width.append(self.widths.code(float(width)))
+        self.fill.append(self.colors.code(fill))
+        self.outline.append(self.colors.code(outline))
+        return oval_id
+
+    def remove(self, oval_id):
+        """Delete an oval, the last row takes its place"""
+        if oval_id not in self:
+            raise KeyError(oval_id)
+        row = self.row_of[oval_id]
+        self.row_of[oval_id] = -1
+        last = len(self.ids) - 1
+        for column in (self.x0, self.y0, self.x1, self.y1, self.width,
+                       self.fill, self.outline, self.ids):
+            column[row] = column[last]
+            del column[last]
+        if row != last:
+            self.row_of[self.ids[row]] = row
+
+    def clear(self):
+        self.__init__()
+
+    def box(self, oval_id):
+        row = self.row_of[oval_id]
+        return self.x0[row], self.y0[row], self.x1[row], self.y1[row]
+
+    def set_box(self, oval_id, box):
+        row = self.row_of[oval_id]
+        self.x0[row], self.y0[row], self.x1[row], self.y1[row] = box
+
+    def move(self, oval_ids, dx, dy):
+        """Shift a selection of ovals"""
+        if np is not None and len(oval_ids) > 64:
+            rows = np.frombuffer(self.row_of, dtype=np.int64)[
+                np.asarray(oval_ids, dtype=np.int64)]
+            for column, d in ((self.x0, dx), (self.x1, dx),
+                              (self.y0, dy), (self.y1, dy)):
+                np.frombuffer(column)[rows] += d
+            return
+        row_of = self.row_of
+        for row in (row_of[oval_id] for oval_id in oval_ids):
+            self.x0[row] += dx
+            self.x1[row] += dx
+            self.y0[row] += dy
+            self.y1[row] += dy
+
+    def hit_test(self, x, y):
+        """Ids of all the ovals containing point (x, y), in row order"""
+        if not self.ids:
+            return []
+        if np is not None:
+            x0, y0 = np.frombuffer(self.x0), np.frombuffer(self.y0)
+            x1, y1 = np.frombuffer(self.x1), np.frombuffer(self.y1)
+            a, b = (x1 - x0) / 2, (y1 - y0) / 2
+            with np.errstate(divide="ignore", invalid="ignore"):
+                inside = ((x - x0 - a) / a)**2 + ((y - y0 - b) / b)**2 <= 1
+            inside &= (a > 0) & (b > 0)
+            return np.frombuffer(self.ids, dtype=np.int64)[inside].tolist()
+        ids = self.ids
+        return [ids[row] for row, box in
+                enumerate(zip(self.x0, self.y0, self.x1, self.y1))
+                if inside_oval(box, x, y)]
+
+    def in_box(self, box, index=None):
+        """Ids of the ovals whose boxes intersect box
+
+        Vectorized over the columns with NumPy, otherwise looked up in the
+        SpatialGrid `index` if given or scanned row by row.
+        """
+        if not self.ids:
+            return []
+        bx0, by0, bx1, by1 = box
+        if np is not None:
+            inside = (np.frombuffer(self.x0) <= bx1) \
+                & (np.frombuffer(self.x1) >= bx0) \
+                & (np.frombuffer(self.y0) <= by1) \
+                & (np.frombuffer(self.y1) >= by0)
+            return np.frombuffer(self.ids, dtype=np.int64)[inside].tolist()
+        if index is not None:
+            return index.query_box(box)
+        return [oval_id for oval_id, x0, y0, x1, y1 in
+                zip(self.ids, self.x0, self.y0, self.x1, self.y1)
+                if x0 <= bx1 and x1 >= bx0 and y0 <= by1 and y1 >= by0]
+
+
+def point_cloud(store, oval_ids, view_x, view_y, zoom, width, height, rgb,
+                background):
+    """PPM image with a pixel at the center of every oval
+
+    `rgb` holds 3-byte colors of the store color palette, `background`
+    is a 3-byte color as well. Used instead of canvas items when too many
+    ovals are in sight.
+    """
+    header = f"P6 {width} {height} 255\n".encode()
+    if np is not None:
+        rows = np.frombuffer(store.row_of, dtype=np.int64)[
+            np.asarray(oval_ids, dtype=np.int64)]
+        cx = (np.frombuffer(store.x0)[rows] + np.frombuffer(store.x1)[rows])/2
+        cy = (np.frombuffer(store.y0)[rows] + np.frombuffer(store.y1)[rows])/2
+        cx = np.floor((cx - view_x) * zoom).astype(np.int64)
+        cy = np.floor((cy - view_y) * zoom).astype(np.int64)
+        keep = (cx >= 0) & (cx < width) & (cy >= 0) & (cy < height)
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        image[:] = np.frombuffer(background, dtype=np.uint8)
+        palette = np.frombuffer(b"".join(rgb), dtype=np.uint8).reshape(-1, 3)
+        fill = np.frombuffer(store.fill, dtype=np.uint32)[rows]
+        image[cy[keep], cx[keep]] = palette[fill[keep]]
+        return header + image.tobytes()
+    image = bytearray(background * (width*height))
+    row_of = store.row_of
+    x0, y0, x1, y1 = store.x0, store.y0, store.x1, store.y1
+    for oval_id in oval_ids:
+        row = row_of[oval_id]
+        cx = int(((x0[row] + x1[row])/2 - view_x) * zoom // 1)
+        cy = int(((y0[row] + y1[row])/2 - view_y) * zoom // 1)
+        if 0 <= cx < width and 0 <= cy < height:
+            i = (cy*width + cx) * 3
+            image[i:i+3] = rgb[store.fill[row]]
+    return header + bytes(image)
+
+
+def _column_property(name):
+    def get(self):
+        return getattr(self.store, name)[self.store.row_of[self.oval_id]]
+
+    def set(self, value):
+        getattr(self.store, name)[self.store.row_of[self.oval_id]] = value
+    return property(get, set)
+
+
+def _palette_property(name, palette, convert=str):
+    def get(self):
+        store = self.store
+        code = getattr(store, name)[store.row_of[self.oval_id]]
+        return getattr(store, palette).values[code]
+
+    def set(self, value):
+        store = self.store
+        getattr(store, name)[store.row_of[self.oval_id]] = \
+            getattr(store, palette).code(convert(value))
+    return property(get, set)
+
+
+class OvalProperties:
+    """View of one oval of a ShapeStore, with the attributes of an object"""
+    __slots__ = ("store", "oval_id")
+
+    x0 = _column_property("x0")
+    y0 = _column_property("y0")
+    x1 = _column_property("x1")
+    y1 = _column_property("y1")
+    border_width = _palette_property("width", "widths", float)
+    fill_color = _palette_property("fill", "colors")
+    border_color = _palette_property("outline", "colors")
+
+    def __init__(self, store, oval_id):
+        self.store = store
+        self.oval_id = oval_id
+
+    def __str__(self):
+        return f"OVAL {self.oval_id} -> "\
+                f"[coords:{self.x0},{self.y0},{self.x1},{self.y1} | "\
+                f"border_width:{self.border_width} | "\
+                f"fill_color:{self.fill_color} | "\
+                f"border_color:{self.border_color}]\n"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def box(self):
+        return self.store.box(self.oval_id)
+
+
+# Scenes are streams of records (oval_id, (x0, y0, x1, y1), width, fill,
+# outline). Binary scene file: header, color palette (length-prefixed UTF-8
+# names), then fixed-size records referring to palette entries.
+SCENE_MAGIC = b"GEOV"
+SCENE_VERSION = 1
+SCENE_HEADER = struct.Struct("<4sHIQ")  # magic, version, colors, records
+SCENE_COLOR = struct.Struct("<H")
+SCENE_RECORD = struct.Struct("<q5dII")  # id, box, width, fill, outline
+
+
+def store_records(store):
+    widths, colors = store.widths.values, store.colors.values
+    for oval_id, x0, y0, x1, y1, width, fill, outline in zip(
+            store.ids, store.x0, store.y0, store.x1, store.y1, store.width,
+            store.fill, store.outline):
+        yield (oval_id, (x0, y0, x1, y1), widths[width], colors[fill],
+               colors[outline])
+
+
+def write_scene(path, store):
+    """Save all the ovals of the store to a binary scene file"""
+    colors = store.colors.values
+    with open(path, "wb") as f:
+        f.write(SCENE_HEADER.pack(SCENE_MAGIC, SCENE_VERSION, len(colors),
+                                  len(store)))
+        for color in colors:
+            name = color.encode()
+            f.write(SCENE_COLOR.pack(len(name)) + name)
+        widths = store.widths.values
+        pack = SCENE_RECORD.pack
+        for row, oval_id in enumerate(store.ids):
+            f.write(pack(oval_id, store.x0[row], store.y0[row],
+                         store.x1[row], store.y1[row],
+                         widths[store.width[row]],
+                         store.fill[row], store.outline[row]))
+
+
+def read_scene(path):
+    """Records of a binary scene file, read from a memory map
+
+    Raises ValueError on files which are not scenes or are corrupt.
+    """
+    with open(path, "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) < SCENE_HEADER.size:
+            raise ValueError(f"{path} is not a scene file")
+        magic, version, ncolors, count = SCENE_HEADER.unpack_from(data)
+        if magic != SCENE_MAGIC or version != SCENE_VERSION:
+            raise ValueError(f"{path} is not a scene file")
+        offset = SCENE_HEADER.size
+        colors = []
+        for _ in range(ncolors):
+            if offset + SCENE_COLOR.size > len(data):
+                raise ValueError(f"{path} is truncated")
+            size, = SCENE_COLOR.unpack_from(data, offset)
+            offset += SCENE_COLOR.size
+            if offset + size > len(data):
+                raise ValueError(f"{path} is truncated")
+            colors.append(bytes(data[offset:offset+size]).decode())
+            offset += size
+        end = offset + count*SCENE_RECORD.size
+        if end > len(data):
+            raise ValueError(f"{path} is truncated")
+        with memoryview(data)[offset:end] as records:
+            for i, (oval_id, x0, y0, x1, y1, width, fill, outline) in \
+                    enumerate(SCENE_RECORD.iter_unpack(records)):
+                if fill >= ncolors or outline >= ncolors:
+                    raise ValueError(f"{path}: record {i} has a color "
+                                     f"out of the palette")
+                if not all(map(math.isfinite, (x0, y0, x1, y1))) or \
+                        not 0 <= width < math.inf:
+                    raise ValueError(f"{path}: record {i} is corrupt")
+                yield (oval_id, (x0, y0, x1, y1), width, colors[fill],
+                       colors[outline])
+
+
+def write_description(path, records):
+    """Save records as description text, one line at a time"""
+    with open(path, "w") as f:
+        for oval_id, (x0, y0, x1, y1), width, fill, outline in records:
+            f.write(f"OVAL {oval_id} -> [coords:{x0},{y0},{x1},{y1} | "
+                    f"border_width:{width} | fill_color:{fill} | "
+                    f"border_color:{outline}]\n")
+
+
+def read_description(path):
+    """Records of a description text file, parsed one line at a time
+
+    Fields missing from a line get the defaults of ShapeStore.add.
+    """
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                oval_id, props = parse_oval_line(line)
+                box = props["x0"], props["y0"], props["x1"], props["y1"]
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"{path}:{line_no}: incorrect line") from e
+            yield (oval_id, box, props.get("border_width", 1.0),
+                   props.get("fill_color", "green"),
+                   props.get("border_color", "midnightblue"))
+
+
+def read_records(path):
+    """Records of a binary scene or a description text file"""
+    with open(path, "rb") as f:
+        binary = f.read(len(SCENE_MAGIC)) == SCENE_MAGIC
+    return read_scene(path) if binary else read_description(path)
+
+
+def match_lines(lines, synced_lines, line_owners):
+    """Owners of the lines carried over unchanged from the synced text
+
+    Lines are matched as a sequence: the common head and tail are skipped
+    and only what lies between is diffed, so inserting or deleting lines
+    does not make the lines after them look edited. Unmatched lines get
+    None, as do lines which had no oval.
+    """
+    n, m = len(lines), len(synced_lines)
+
+    def owner(j):
+        return line_owners[j] if j < len(line_owners) else None
+    head = 0
+    while head < min(n, m) and lines[head] == synced_lines[head]:
+        head += 1
+    tail = 0
+    while tail < min(n, m) - head and \
+            lines[n-1-tail] == synced_lines[m-1-tail]:
+        tail += 1
+    owners = [owner(j) for j in range(head)] + [None] * (n - head - tail) + \
+        [owner(j) for j in range(m - tail, m)]
+    if head + tail < min(n, m):
+        matcher = difflib.SequenceMatcher(
+            None, synced_lines[head:m-tail], lines[head:n-tail],
+            autojunk=False)
+        for a, b, size in matcher.get_matching_blocks():
+            for k in range(size):
+                owners[head+b+k] = owner(head+a+k)
+    return owners
+
+
+def diff_description(lines, synced_lines, line_owners, known,
+                     chunk_size=2000):
+    """Parse the description lines changed since the last sync
+
+    Returns the owners of the lines (see match_lines) and a generator of
+    the parsed dirty lines. A line is dirty if it has no owner: it is new,
+    edited, was incorrect or is empty. Dirty lines are parsed `chunk_size`
+    at a time, every chunk is yielded as (dirty, updates, errors): indexes
+    of its dirty lines, (index, oval_id, changes) of correct ones and
+    indexes of incorrect ones. Lines of unknown ovals (`known(oval_id)` is
+    false) and of ovals already described on another line are incorrect.
+    Only uses its arguments, so it may run in a worker thread while the
+    text is being edited.
+    """
+    owners = match_lines(lines, synced_lines, line_owners)
+    return owners, parse_dirty_lines(lines, owners, known, chunk_size)
+
+
+def parse_dirty_lines(lines, owners, known, chunk_size):
+    dirty = [i for i, oval_id in enumerate(owners) if oval_id is None]
+    taken = {oval_id for oval_id in owners if oval_id is not None}
+    for lo in range(0, len(dirty), chunk_size):
+        chunk = dirty[lo:lo+chunk_size]
+        updates, errors = [], []
+        for i in chunk:
+            if not lines[i]:
+                continue
+            try:
+                oval_id, changes = parse_oval_line(lines[i])
+            except (ValueError, KeyError, IndexError):
+                errors.append(i)
+                continue
+            if oval_id in taken or not known(oval_id):
+                errors.append(i)
+            else:
+                taken.add(oval_id)
+                updates.append((i, oval_id, changes))
+        yield chunk, updates, errors
@@ -0,0 +1,232 @@
+"""Benchmarks for GraphicsEditor shape model
+
+Run all of them via `python benchmark.py` or a single one via
+`python benchmark.py <name>`. None of them requires a display.
+"""
+import os
+import random as rnd
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import ShapeModel
+from ShapeModel import (ShapeStore, SpatialGrid, diff_description,
+                        inside_oval, parse_oval_line, point_cloud,
+                        read_records, store_records, write_description,
+                        write_scene)
+
+
+def random_boxes(count, size=2000, seed=5):
+    """Ovals with sizes of a few dozen pixels scattered over the plane"""
+    rng = rnd.Random(seed)
+    boxes = {}
+    for oval_id in range(1, count+1):
+        x0, y0 = rng.uniform(0, size), rng.uniform(0, size)
+        boxes[oval_id] = (x0, y0, x0+rng.uniform(5, 80), y0+rng.uniform(5, 80))
+    return boxes
+
+
+def linear_hit(boxes, x, y):
+    hits = [oval_id for oval_id, box in boxes.items() if inside_oval(box, x, y)]
+    return max(hits, default=None)
+
+
+def grid_hit(grid, boxes, x, y):
+    hits = [oval_id for oval_id in grid.query_point(x, y)
+            if inside_oval(boxes[oval_id], x, y)]
+    return max(hits, default=None)
+
+
+def bench_hit_test(count=20_000, clicks=2000):
+    """Click hit-testing: linear scan over all ovals vs uniform grid"""
+    boxes = random_boxes(count)
+    start = time.perf_counter()
+    grid = SpatialGrid()
+    for oval_id, box in boxes.items():
+        grid.insert(oval_id, box)
+    build = time.perf_counter() - start
+    rng = rnd.Random(1)
+    points = [(rng.uniform(0, 2000), rng.uniform(0, 2000)) for _ in range(clicks)]
+
+    start = time.perf_counter()
+    expected = [linear_hit(boxes, x, y) for x, y in points]
+    linear = (time.perf_counter() - start) / clicks
+    start = time.perf_counter()
+    found = [grid_hit(grid, boxes, x, y) for x, y in points]
+    indexed = (time.perf_counter() - start) / clicks
+    assert found == expected
+    print(f"{count} ovals, index built in {build*1000:.0f}ms")
+    print(f"linear scan: {linear*1e6:10.1f} us/click")
+    print(f"grid index:  {indexed*1e6:10.1f} us/click "
+          f"({linear/indexed:.0f}x faster)")
+
+
+def bench_index_update(count=20_000, moves=100_000):
+    """Keeping the index up to date while ovals are dragged around"""
+    boxes = random_boxes(count)
+    grid = SpatialGrid()
+    for oval_id, box in boxes.items():
+        grid.insert(oval_id, box)
+    rng = rnd.Random(2)
+    start = time.perf_counter()
+    for _ in range(moves):
+        oval_id = rng.randint(1, count)
+        x0, y0, x1, y1 = grid.boxes[oval_id]
+        dx, dy = rng.uniform(-3, 3), rng.uniform(-3, 3)
+        grid.update(oval_id, (x0+dx, y0+dy, x1+dx, y1+dy))
+    elapsed = time.perf_counter() - start
+    print(f"{moves/elapsed:.0f} updates/s")
+
+
+def describe(boxes):
+    return [f"OVAL {oval_id} -> [coords:{x0},{y0},{x1},{y1} | border_width:1.0"
+            f" | fill_color:green | border_color:midnightblue]"
+            for oval_id, (x0, y0, x1, y1) in boxes.items()]
+
+
+def bench_description_sync(count=100_000):
+    """Applying edited description lines: re-parse all vs dirty lines"""
+    synced = describe(random_boxes(count))
+    owners = list(range(1, count+1))
+    edited = list(synced)
+    edited[count//2] = edited[count//2].replace("green", "red")
+    start = time.perf_counter()
+    for line in edited:
+        parse_oval_line(line)
+    full = time.perf_counter() - start
+    print(f"{count} lines, full re-parse: {full*1000:8.1f}ms")
+    # a line inserted at the top shifts all the others, they stay clean
+    inserted = ["OVAL 0 -> [coords:0,0,1,1 | border_width:1.0 | "
+                "fill_color:green | border_color:midnightblue]"] + edited
+    for what, lines in [("1 edited line", edited),
+                        ("1 inserted line", inserted)]:
+        start = time.perf_counter()
+        _, chunks = diff_description(lines, synced, owners, lambda _: True)
+        dirty = sum(len(chunk[0]) for chunk in chunks)
+        elapsed = time.perf_counter() - start
+        print(f"{what:16}: {dirty} dirty, {elapsed*1000:8.1f}ms")
+    # everything edited: the worker thread parses, Tk gets 2000 line chunks
+    start = time.perf_counter()
+    _, chunks = diff_description(edited, [], [], lambda _: True)
+    chunks = list(chunks)
+    print(f"{count} dirty lines: {time.perf_counter()-start:.2f}s in the worker, "
+          f"{len(chunks)} chunks posted to the Tk thread")
+
+
+class OvalObject:
+    """Former per-oval representation, for comparison"""
+    def __init__(self, oval_id, box):
+        self.x0, self.y0, self.x1, self.y1 = box
+        self.border_width = "1.0"
+        self.fill_color = "green"
+        self.border_color = "midnightblue"
+        self.oval_id = oval_id
+
+
+def memory(func, peak=False):
+    """Result of func and memory it left allocated (or its peak usage)"""
+    tracemalloc.start()
+    result = func()
+    size, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak_size if peak else size
+
+
+def bench_store(count=200_000, clicks=20):
+    """Columnar ShapeStore vs an object per oval: memory and bulk operations"""
+    boxes = random_boxes(count)
+    _, objects = memory(lambda: {oval_id: OvalObject(oval_id, box)
+                                 for oval_id, box in boxes.items()})
+
+    def fill():
+        store = ShapeStore()
+        for oval_id, box in boxes.items():
+            store.add(box, oval_id=oval_id)
+        return store
+    store, columns = memory(fill)
+    print(f"{count} ovals: objects {objects/2**20:.1f} MiB, "
+          f"columns {columns/2**20:.1f} MiB")
+
+    numpy = ShapeModel.np
+    rng = rnd.Random(3)
+    points = [(rng.uniform(0, 2000), rng.uniform(0, 2000)) for _ in range(clicks)]
+    selection = list(store)[::2]
+    for name in (["numpy"] if numpy is not None else []) + ["python"]:
+        ShapeModel.np = numpy if name == "numpy" else None
+        start = time.perf_counter()
+        for x, y in points:
+            store.hit_test(x, y)
+        hit = (time.perf_counter() - start) / clicks
+        start = time.perf_counter()
+        store.move(selection, 1.0, -1.0)
+        move = time.perf_counter() - start
+        print(f"{name:>6}: hit test of all ovals {hit*1000:7.1f}ms, "
+              f"moving {len(selection)} ovals {move*1000:7.1f}ms")
+    ShapeModel.np = numpy
+
+
+def bench_scene_io(count=1_000_000):
+    """Saving and streaming back a scene: binary records vs description text"""
+    store = ShapeStore()
+    for oval_id, box in random_boxes(count).items():
+        store.add(box, oval_id=oval_id)
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, write in [
+                ("scene.ovals", lambda path: write_scene(path, store)),
+                ("scene.txt", lambda path: write_description(
+                    path, store_records(store)))]:
+            path = os.path.join(tmp, name)
+            start = time.perf_counter()
+            write(path)
+            saved = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = sum(1 for _ in read_records(path))
+            elapsed = time.perf_counter() - start
+            assert loaded == count
+            _, peak = memory(lambda: sum(1 for _ in read_records(path)),
+                             peak=True)
+            print(f"{name:>11}: {os.path.getsize(path)/2**20:6.1f} MiB, "
+                  f"saved in {saved:.2f}s, read {count/elapsed:9.0f} "
+                  f"ovals/s, peak memory while reading {peak/2**10:.0f} KiB")
+
+
+def bench_render(count=200_000, frames=20):
+    """Per-frame model work of the culling renderer: culling and point cloud"""
+    boxes = random_boxes(count, size=20000)
+    store, grid = ShapeStore(), SpatialGrid()
+    for box in boxes.values():
+        grid.insert(store.add(box), box)
+    colors = [b"\0\x80\0"] * len(store.colors.values)
+    numpy = ShapeModel.np
+    for name in (["numpy"] if numpy is not None else []) + ["python"]:
+        ShapeModel.np = numpy if name == "numpy" else None
+        for zoom in [0.03, 1.0]:
+            start = time.perf_counter()
+            for frame in range(frames):
+                view = frame*10 / zoom
+                box = (view, view, view + 600/zoom, view + 600/zoom)
+                oval_ids = store.in_box(box, grid)
+                if zoom < 1:
+                    point_cloud(store, oval_ids, view, view, zoom, 600, 600,
+                                colors, b"\xff\xff\xff")
+            elapsed = (time.perf_counter() - start) / frames
+            what = "point cloud" if zoom < 1 else "canvas items"
+            print(f"{name:>6}, zoom {zoom:4}: {len(oval_ids):6} ovals in sight "
+                  f"({what}), {elapsed*1000:6.1f}ms/frame")
+    ShapeModel.np = numpy
+
+
+BENCHMARKS = {
+    "hit_test": bench_hit_test,
+    "index_update": bench_index_update,
+    "description_sync": bench_description_sync,
+    "store": bench_store,
+    "scene_io": bench_scene_io,
+    "render": bench_render,
+}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(BENCHMARKS):
+        print(f"== {name}")
+        BENCHMARKS[name]()
@@ -0,0 +1,331 @@
+"""Synthetic input benchmarks of the tkinter apps of this repository
+
+    python tkbench.py [--display :N] [--scale X] [--save-baseline]
+                      [--baseline FILE] [--tolerance T] [scenario ...]
+
+Every scenario runs in its own process on a virtual X server (Xvfb is
+started unless --display is given) and feeds a scripted stream of events
+to the app through event_generate:
+
+    game15          thousands of tile moves, tiles are gridded buttons
+    game15_canvas   the same on the animated canvas grid
+    labeledit       a 100k keystroke editing session
+    graphics        10k ovals drawn and dragged, a frame per motion
+
+Handlers are timed by tkprobe. Reported are events per second, p50/p99
+latency of the handlers the scenario exercises and peak RSS. Results are
+compared with the baseline file; a throughput drop, a p99 or RSS growth
+of more than the tolerance fails the run. --save-baseline records the
+current results instead.
+"""
+import argparse
+import json
+import os
+import random as rnd
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+import tkprobe
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(ROOT, "tkbench_baseline.json")
+# p99 comes from histogram buckets a fifth apart, tiny handlers also
+# suffer from timer noise: smaller p99 changes are never regressions
+P99_SLACK_MS = 0.05
+
+
+def use_app(directory):
+    """Make the modules of an app directory importable"""
+    sys.path.insert(0, os.path.join(ROOT, directory))
+
+
+class NoDialogs:
+    """Stand-in of tkinter.messagebox: a modal dialog would stop the run"""
+    @staticmethod
+    def showinfo(*args, **kwargs):
+        pass
+
+
+def movable_tile(board, rng, last):
+    """Random tile next to the blank, other than the one just moved"""
+    i, j = divmod(board.blank, board.w)
+    cells = [(i+di)*board.w + j+dj
+             for di, dj in ((-1, 0), (1, 0), (0, -1), (0, 1))
+             if 0 <= i+di < board.h and 0 <= j+dj < board.w]
+    tiles = [board.cells[c] for c in cells if board.cells[c] != last]
+    return rng.choice(tiles)
+
+
+def play_game15(count, canvas):
+    use_app("03_ThreeWayAndTkinter")
+    import tkinter as tk
+    import game15
+    game15.messagebox = NoDialogs()
+    window = tk.Tk()
+    gg = game15.CanvasGrid(4, 4, seed=15) if canvas else \
+        game15.GameGrid(4, 4, seed=15)
+    gg.initialize_game_buttons(window)
+    gg.initialize_game_grid()
+    window.update()
+    rng, tile = rnd.Random(15), None
+    size = getattr(gg, "tile_size", 0)
+    start = time.perf_counter()
+    for _ in range(count):
+        tile = movable_tile(gg.board, rng, tile)
+        if canvas:
+            i, j = divmod(gg.board.pos[tile], gg.w)
+            gg.canvas.event_generate("<Button-1>", x=j*size + size//2,
+                                     y=i*size + size//2)
+        else:
+            button = gg.buttons[tile]
+            button.event_generate("<Enter>")
+            button.event_generate("<ButtonPress-1>", x=4, y=4)
+            button.event_generate("<ButtonRelease-1>", x=4, y=4)
+            button.event_generate("<Leave>")
+        window.update()
+    elapsed = time.perf_counter() - start
+    assert tkprobe.stats["playstep"].count == count, "moves were lost"
+    window.destroy()
+    return count, elapsed, ["playstep"]
+
+
+def bench_game15(count=5000):
+    """Tile moves on the button grid"""
+    return play_game15(count, canvas=False)
+
+
+def bench_game15_canvas(count=5000):
+    """Tile moves on the canvas grid, animations included"""
+    return play_game15(count, canvas=True)
+
+
+def bench_labeledit(count=100_000, flush=100):
+    """Typing session on InputLabel, drawn every `flush` keys"""
+    use_app("04_PublicRepositoryEvents")
+    import LabelEdit
+    from benchmark import generate_keys, replay
+    keys = generate_keys(count)
+    expected = replay(keys).buffer
+    app = LabelEdit.App(title="tkbench")
+    app.update()
+    label = app.IL
+    label.focus_force()
+    app.update()
+    start = time.perf_counter()
+    for i, (key, char) in enumerate(keys, 1):
+        if key.startswith("Control-"):
+            label.event_generate("<KeyPress>", keysym=key[8:],
+                                 state=LabelEdit.CONTROL_MASK)
+        else:
+            label.event_generate("<KeyPress>", keysym=key)
+        if i % flush == 0:
+            app.update()
+    app.update()
+    elapsed = time.perf_counter() - start
+    assert str(label.buffer) == str(expected), "keystrokes were lost"
+    app.master.destroy()
+    return count, elapsed, ["InputLabel.write", "InputLabel.render"]
+
+
+def bench_graphics(count=10_000, spacing=12, size=8, flush=10, shift=2):
+    """Ovals drawn on an empty spot, then dragged around and left `shift`
+    pixels away, a frame being drawn after every motion"""
+    use_app("05_SshAndSmartWidgents")
+    import GraphicsEditor
+    # a short frame: drags are applied by `after` once per frame
+    app = GraphicsEditor.App(title="tkbench", frame_rate=1000)
+    app.update()
+    canvas = app.C
+    width, height = canvas.winfo_width(), canvas.winfo_height()
+    spots = [(x, y) for y in range(4, height - spacing, spacing)
+             for x in range(4, width - spacing, spacing)]
+    middle = size // 2
+    events = 0
+    slept = 0.0
+
+    def next_frame():
+        nonlocal slept
+        # waiting for the frame is not part of the work measured
+        start = time.perf_counter()
+        time.sleep(app.frame_ms / 1000)
+        slept += time.perf_counter() - start
+        while app.drag_job is not None:
+            app.update()
+
+    start = time.perf_counter()
+    for i in range(count):
+        if i and i % len(spots) == 0:
+            # the view is full: move on to an empty part of the world
+            app.pan(-width, 0)
+        x, y = spots[i % len(spots)]
+        canvas.event_generate("<ButtonPress-1>", x=x, y=y)
+        canvas.event_generate("<Motion>", x=x+size, y=y+size)
+        canvas.event_generate("<ButtonRelease-1>", x=x+size, y=y+size)
+        x, y = x + middle, y + middle
+        canvas.event_generate("<ButtonPress-1>", x=x, y=y)
+        for dx, dy in ((spacing, 0), (spacing, spacing), (shift, shift)):
+            canvas.event_generate("<Motion>", x=x+dx, y=y+dy)
+            next_frame()
+        canvas.event_generate("<ButtonRelease-1>", x=x+shift, y=y+shift)
+        events += 9
+        if i % flush == 0:
+            app.update()
+    app.update()
+    elapsed = time.perf_counter() - start - slept
+    assert len(app.ovals) == count, f"{len(app.ovals)} ovals drawn"
+    x0, y0 = app.to_world(x - middle + shift, y - middle + shift)
+    assert app.ovals[max(app.ovals)].box()[:2] == (x0, y0), "ovals not dragged"
+    assert tkprobe.stats["App.apply_drag"].count >= 3 * count, \
+        "motions were coalesced"
+    app.master.destroy()
+    return events, elapsed, ["App.bind_oval.handle_press",
+                             "App.bind_oval.handle_motion",
+                             "App.bind_oval.handle_release",
+                             "App.apply_drag"]
+
+
+BENCHMARKS = {
+    "game15": bench_game15,
+    "game15_canvas": bench_game15_canvas,
+    "labeledit": bench_labeledit,
+    "graphics": bench_graphics,
+}
+
+
+def run_scenario(name, scale):
+    """Body of the scenario process: results as a JSON line on stdout"""
+    tkprobe.enable(json_path=None)
+    bench = BENCHMARKS[name]
+    count = max(1, round(bench.__defaults__[0] * scale))
+    events, elapsed, handlers = bench(count)
+    stats = tkprobe.report()["handlers"]
+    result = {
+        "count": count,
+        "events_per_s": round(events / elapsed, 1),
+        "rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                         / 1024, 1),
+        "handlers": {handler: {key: stats[handler][key]
+                               for key in ("count", "p50_ms", "p99_ms")}
+                     for handler in handlers if handler in stats},
+    }
+    print(json.dumps(result))
+
+
+def start_xvfb():
+    """Start Xvfb on a free display, return the process and the display"""
+    if shutil.which("Xvfb") is None:
+        sys.exit("tkbench: Xvfb not found, install it or pass --display")
+    read_fd, write_fd = os.pipe()
+    server = subprocess.Popen(
+        ["Xvfb", "-displayfd", str(write_fd), "-screen", "0", "1280x1024x24",
+         "-nolisten", "tcp"], pass_fds=[write_fd], stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        number = f.readline().strip()
+    if not number:
+        server.kill()
+        sys.exit("tkbench: Xvfb failed to start")
+    return server, ":" + number
+
+
+def measure(name, scale, display):
+    env = dict(os.environ, DISPLAY=display)
+    out = subprocess.run([sys.executable, os.path.abspath(__file__),
+                          "--run", name, "--scale", str(scale)],
+                         env=env, stdout=subprocess.PIPE, text=True)
+    if out.returncode != 0:
+        return None
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def regressions(result, base, tolerance):
+    """Descriptions of the ways result is worse than base"""
+    found = []
+    if base["count"] != result["count"]:
+        return [f"baseline is for {base['count']} events, rerun with "
+                f"the same --scale or save a new one"]
+    if result["events_per_s"] < base["events_per_s"] * (1 - tolerance):
+        found.append(f"throughput {result['events_per_s']:.0f}/s, "
+                     f"baseline {base['events_per_s']:.0f}/s")
+    if result["rss_mib"] > base["rss_mib"] * (1 + tolerance):
+        found.append(f"RSS {result['rss_mib']} MiB, "
+                     f"baseline {base['rss_mib']} MiB")
+    for handler, stats in result["handlers"].items():
+        was = base["handlers"].get(handler)
+        if was is not None and stats["p99_ms"] > \
+                was["p99_ms"] * (1 + tolerance) + P99_SLACK_MS:
+            found.append(f"{handler} p99 {stats['p99_ms']}ms, "
+                         f"baseline {was['p99_ms']}ms")
+    return found
+
+
+def show(name, result):
+    print(f"== {name}: {result['count']} inputs, "
+          f"{result['events_per_s']:.0f} events/s, "
+          f"RSS {result['rss_mib']} MiB")
+    for handler, stats in result["handlers"].items():
+        print(f"   {handler:32} {stats['count']:8} calls  "
+              f"p50 {stats['p50_ms']:8.3f}ms  p99 {stats['p99_ms']:8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scripted input benchmarks of the Tk apps")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"some of {', '.join(BENCHMARKS)}; all by default")
+    parser.add_argument("--display", default=None,
+                        help="X display to use instead of starting Xvfb")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiplier of the scenario input counts")
+    parser.add_argument("--baseline", default=BASELINE, metavar="FILE")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="record the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative regression")
+    parser.add_argument("--run", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run is not None:
+        run_scenario(args.run, args.scale)
+        return
+    names = args.scenarios or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown scenario {name}")
+
+    server, display = (None, args.display) if args.display else start_xvfb()
+    try:
+        results = {name: measure(name, args.scale, display) for name in names}
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failed = False
+    for name, result in results.items():
+        if result is None:
+            print(f"== {name}: FAILED to run")
+            failed = True
+            continue
+        show(name, result)
+        if not args.save_baseline and name in baseline:
+            for problem in regressions(result, baseline[name], args.tolerance):
+                print(f"   REGRESSION: {problem}")
+                failed = True
+    if args.save_baseline:
+        baseline.update((name, result) for name, result in results.items()
+                        if result is not None)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.baseline}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
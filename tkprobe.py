@@ -0,0 +1,261 @@
+"""Event latency instrumentation for the tkinter apps of this repository
+
+Run any of the apps through it:
+    python tkprobe.py [--json FILE] [--overlay] [--lag-ms N] SCRIPT [args ...]
+e.g. `python tkprobe.py 04_PublicRepositoryEvents/LabelEdit.py --font Sans`.
+
+While enabled every Tk callback (bindings, button commands, `after` and
+`after_idle` calls) is timed under its qualified name, together with the
+number of Tcl calls it made; event loop lag is sampled with a heartbeat.
+Statistics are shown in an overlay window (--overlay) and dumped as JSON
+at exit. Apps mark handlers Tk does not call directly with `probed`:
+
+    try:
+        from tkprobe import probed
+    except ImportError:
+        def probed(func):
+            return func
+
+Unless the probe is enabled (by the launcher, before the app is imported)
+`probed` returns the function itself and tkinter is left untouched, so the
+instrumentation costs nothing when it is off.
+"""
+import argparse
+import atexit
+import functools
+import json
+import math
+import os
+import runpy
+import sys
+import time
+import tkinter as tk
+
+enabled = False
+stats = {}
+lag = None
+tcl_calls = 0
+started = None
+
+
+class Histogram:
+    """Latency histogram with buckets a quarter of a binary order wide"""
+    SUB = 4
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.tcl_calls = 0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        us = seconds * 1e6
+        b = int(math.log2(us) * self.SUB) if us >= 1 else 0
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+
+    def percentile(self, q):
+        """Upper bound of the q-th percentile, in seconds"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen >= rank:
+                return min(2 ** ((b+1) / self.SUB) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1e3, 3),
+            "mean_ms": round(self.total / max(self.count, 1) * 1e3, 4),
+            "p50_ms": round(self.percentile(50) * 1e3, 4),
+            "p99_ms": round(self.percentile(99) * 1e3, 4),
+            "max_ms": round(self.max * 1e3, 4),
+            "tcl_calls": self.tcl_calls,
+        }
+
+
+def handler_name(func):
+    func = getattr(func, "__func__", func)
+    name = getattr(func, "__qualname__", None) or repr(func)
+    return name.replace("<locals>.", "")
+
+
+def timed(func, name=None):
+    """func recording its latency and Tcl calls under name"""
+    hist = stats.setdefault(name or handler_name(func), Histogram())
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        calls = tcl_calls
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            hist.add(time.perf_counter() - start)
+            hist.tcl_calls += tcl_calls - calls
+    wrapper.probed = True
+    return wrapper
+
+
+def probed(func):
+    """Decorator timing a handler, a no-op unless the probe is enabled"""
+    return timed(func) if enabled else func
+
+
+class CountingTk:
+    """Proxy of a Tcl interpreter counting calls into it"""
+    # interpreter methods which run Tcl code or touch its variables and
+    # commands; the rest (conversions, event loop) pass through as is
+    COUNTED = {"call", "eval", "evalfile", "record", "setvar", "getvar",
+               "unsetvar", "globalsetvar", "globalgetvar", "globalunsetvar",
+               "createcommand", "deletecommand", "exprstring", "exprlong",
+               "exprdouble", "exprboolean", "adderrorinfo"}
+
+    def __init__(self, interp):
+        self._interp = interp
+
+    def __getattr__(self, name):
+        attr = getattr(self._interp, name)
+        if name not in self.COUNTED:
+            return attr
+
+        def counted(*args):
+            global tcl_calls
+            tcl_calls += 1
+            return attr(*args)
+        # looked up once, later calls find it on the instance
+        setattr(self, name, counted)
+        return counted
+
+
+def install(lag_ms=20, overlay=False):
+    """Hook tkinter: time callbacks, count Tcl calls, watch loop lag"""
+    register, after, tk_init = tk.Misc._register, tk.Misc.after, tk.Tk.__init__
+
+    def _register(self, func, subst=None, needcleanup=1):
+        if not getattr(func, "probed", False) and \
+                not handler_name(func).endswith("after.callit"):
+            func = timed(func)
+        return register(self, func, subst, needcleanup)
+
+    def _after(self, ms, func=None, *args):
+        if func is not None and not getattr(func, "probed", False):
+            func = timed(func)
+        return after(self, ms, func, *args)
+
+    def _tk_init(self, *args, **kwargs):
+        tk_init(self, *args, **kwargs)
+        self.tk = CountingTk(self.tk)
+        heartbeat(self, lag_ms, after)
+        if overlay:
+            Overlay(self, after)
+
+    tk.Misc._register = _register
+    tk.Misc.after = _after
+    tk.Tk.__init__ = _tk_init
+
+
+def heartbeat(root, interval_ms, after):
+    """Record how late the event loop runs a callback due every interval"""
+    global lag
+    lag = Histogram()
+    due = [time.perf_counter() + interval_ms/1000]
+
+    def beat():
+        now = time.perf_counter()
+        lag.add(max(0.0, now - due[0]))
+        due[0] = now + interval_ms/1000
+        after(root, interval_ms, beat)
+    after(root, interval_ms, beat)
+
+
+def report():
+    handlers = sorted(stats.items(), key=lambda item: -item[1].total)
+    return {
+        "app": sys.argv[0],
+        "wall_s": round(time.perf_counter() - started, 3) if started else 0,
+        "tcl_calls": tcl_calls,
+        "event_loop_lag": lag.summary() if lag is not None else None,
+        "handlers": {name: hist.summary() for name, hist in handlers
+                     if hist.count},
+    }
+
+
+class Overlay(tk.Toplevel):
+    """Window with the busiest handlers, refreshed twice a second"""
+    def __init__(self, root, after, rows=12):
+        super().__init__(root)
+        self.title("tkprobe")
+        self.attributes("-topmost", True)
+        self.rows, self.after_raw = rows, after
+        self.label = tk.Label(self, font="TkFixedFont", justify=tk.LEFT,
+                              anchor="nw")
+        self.label.pack(fill=tk.BOTH, expand=True)
+        self.last_calls, self.last_time = tcl_calls, time.perf_counter()
+        self.after_raw(self, 500, self.refresh)
+
+    def refresh(self):
+        data = report()
+        now = time.perf_counter()
+        rate = (tcl_calls - self.last_calls) / (now - self.last_time)
+        self.last_calls, self.last_time = tcl_calls, now
+        loop = data["event_loop_lag"] or {}
+        lines = [f"Tcl calls/s {rate:9.0f}   loop lag p99 "
+                 f"{loop.get('p99_ms', 0):7.2f}ms",
+                 f"{'handler':42} {'calls':>7} {'p50 ms':>8} {'p99 ms':>8} "
+                 f"{'max ms':>8}"]
+        for name, s in list(data["handlers"].items())[:self.rows]:
+            lines.append(f"{name[-42:]:42} {s['count']:7} {s['p50_ms']:8.2f} "
+                         f"{s['p99_ms']:8.2f} {s['max_ms']:8.2f}")
+        self.label.configure(text="\n".join(lines))
+        self.after_raw(self, 500, self.refresh)
+
+
+def dump(path):
+    with open(path, "w") as f:
+        json.dump(report(), f, indent=2)
+
+
+def enable(json_path="tkprobe.json", lag_ms=20, overlay=False):
+    """Turn the probe on; call before the app modules are imported"""
+    global enabled, started
+    if enabled:
+        return
+    enabled = True
+    started = time.perf_counter()
+    install(lag_ms, overlay)
+    if json_path:
+        atexit.register(dump, json_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a tkinter app with event latency instrumentation")
+    parser.add_argument("--json", default="tkprobe.json", metavar="FILE",
+                        help="statistics file written at exit")
+    parser.add_argument("--overlay", action="store_true",
+                        help="show live statistics in a separate window")
+    parser.add_argument("--lag-ms", type=int, default=20,
+                        help="event loop heartbeat interval")
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    json_path = os.path.abspath(args.json)
+    # the app imports this module as `tkprobe`, not as __main__
+    module = sys.modules.setdefault("tkprobe", sys.modules[__name__])
+    module.enable(json_path, args.lag_ms, args.overlay)
+    sys.argv = [args.script] + args.args
+    sys.path[0] = os.path.dirname(os.path.abspath(args.script))
+    runpy.run_path(args.script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()